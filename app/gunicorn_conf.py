@@ -0,0 +1,41 @@
+"""
+Configuration gunicorn : plusieurs workers uvicorn partageant un seul modèle en mémoire
+
+Le modèle est chargé une fois dans le processus maître (preload_app) puis partagé
+en copie-sur-écriture par les workers créés par fork. Les ressources asynchrones
+(pool Redis, écrivain de logs, executor d'inférence) sont créées après le fork,
+dans le lifespan de chaque worker.
+
+Usage :
+    gunicorn -c app/gunicorn_conf.py app.main:app
+"""
+import gc
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+
+# Métriques Prometheus multi-processus : répertoire vidé avant le chargement de l'application
+multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if multiproc_dir:
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def when_ready(server):
+    """Geler les objets du maître (modèle compris) : le GC des workers ne les touchera pas,
+    leurs pages restent partagées au lieu d'être copiées"""
+    gc.freeze()
+    server.log.info(f"Modèle préchargé, {workers} worker(s) partagent la mémoire du maître")
+
+
+def child_exit(server, worker):
+    """Nettoyer les fichiers de métriques d'un worker terminé"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
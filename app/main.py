@@ -1,25 +1,64 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
-from pydantic import BaseModel, Field
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, Gauge, generate_latest, multiprocess, CONTENT_TYPE_LATEST
+)
 import joblib
+import numpy as np
 import pandas as pd
-import redis
-import json
+import redis.asyncio as aioredis
+import asyncio
+import contextvars
+import csv
 import hashlib
+import io
+import json
 import logging
+import secrets
+import socket
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager, nullcontext
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, List, Optional
 import os
 
+from pipeline.features import CURRENT_YEAR, INPUT_FEATURES, feature_frame, feature_matrix
+
 # CONFIGURATION
 MODEL_PATH = os.getenv("MODEL_PATH")
 FEATURE_INFO_PATH = os.getenv("FEATURE_INFO_PATH")
+MODEL_BUNDLE_PATH = os.getenv("MODEL_BUNDLE_PATH")
+MODEL_BUNDLE_FORMAT_VERSION = 1
+COMPILED_MAX_ROWS = int(os.getenv("COMPILED_MAX_ROWS", "512"))
+LOOKUP_TABLE_PATH = os.getenv("LOOKUP_TABLE_PATH")
 REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PORT = int(os.getenv("REDIS_PORT"))
 REDIS_TTL = int(os.getenv("REDIS_TTL"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "4"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+LOG_FILE_PATH = os.getenv("LOG_FILE_PATH")
+WORKER_ID = os.getenv("WORKER_ID")
+L1_CACHE_SIZE = int(os.getenv("L1_CACHE_SIZE", "1024"))
+L1_CACHE_TTL = float(os.getenv("L1_CACHE_TTL", "60"))
 MODEL_VERSION = os.getenv("MODEL_VERSION")
+MODEL_VERSION_BASE = MODEL_VERSION  # préfixe des versions attribuées au rechargement
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1000"))
+MICRO_BATCH_WINDOW_MS = float(os.getenv("MICRO_BATCH_WINDOW_MS", "0"))
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+STREAM_MAX_LINE_CHARS = 1024 * 1024  # ligne NDJSON la plus longue acceptée
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
 
 # LOGGING  
 logging.basicConfig(
@@ -28,11 +67,78 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# TRACES OPENTELEMETRY (optionnelles : un span par étape de prédiction)
+tracer = None
+if TRACING_ENABLED:
+    try:
+        from opentelemetry import trace
+        tracer = trace.get_tracer("carprice-api")
+    except ImportError:
+        logger.warning("⚠️ TRACING_ENABLED sans le paquet opentelemetry-api : traces désactivées")
+
+# REDIS (client asynchrone, connecté au démarrage de l'application)
+redis_client = None
+
+async def connect_redis():
+    """Créer le pool de connexions Redis asynchrone et vérifier la connexion"""
+    pool = aioredis.ConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        decode_responses=True,
+        socket_connect_timeout=5
+    )
+    client = aioredis.Redis.from_pool(pool)  # aclose() ferme aussi le pool
+    try:
+        await client.ping()
+        logger.info(f"✅ Redis connecté sur {REDIS_HOST}:{REDIS_PORT} (pool: {REDIS_MAX_CONNECTIONS})")
+        return client
+    except Exception as e:
+        await client.aclose()
+        logger.warning(f"⚠️ Redis non disponible: {e}")
+        return None
+
+# EXECUTOR D'INFÉRENCE (borné, hors de la boucle asyncio)
+inference_executor = None
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Créer l'executor d'inférence à la première utilisation"""
+    global inference_executor
+    if inference_executor is None:
+        inference_executor = ThreadPoolExecutor(
+            max_workers=INFERENCE_WORKERS,
+            thread_name_prefix="inference"
+        )
+    return inference_executor
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ouvrir les ressources au démarrage et les libérer à l'arrêt"""
+    global redis_client, inference_executor
+    redis_client = await connect_redis()
+    redis_connected.set(1 if redis_client else 0)
+    prediction_log_writer.start()
+    watcher = None
+    if MODEL_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(watch_model_artifacts(MODEL_WATCH_INTERVAL))
+    yield
+    if watcher:
+        watcher.cancel()
+    await prediction_log_writer.stop()
+    if redis_client:
+        await redis_client.aclose()
+        redis_client = None
+    redis_connected.set(0)
+    if inference_executor:
+        inference_executor.shutdown(wait=True)
+        inference_executor = None
+
 # FASTAPI APP
 app = FastAPI(
     title="CarPrice Prediction API",
     description="API pour prédire le prix des voitures d'occasion au Maroc",
-    version=MODEL_VERSION
+    version=MODEL_VERSION,
+    lifespan=lifespan
 )
 
 # CORS
@@ -44,29 +150,218 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# REDIS
-try:
-    redis_client = redis.Redis(
-        host=REDIS_HOST,
-        port=REDIS_PORT,
-        decode_responses=True,
-        socket_connect_timeout=5
-    )
-    redis_client.ping()
-    logger.info(f"✅ Redis connecté sur {REDIS_HOST}:{REDIS_PORT}")
-except Exception as e:
-    redis_client = None
-    logger.warning(f"⚠️ Redis non disponible: {e}")
-
 # CHARGER MODÈLE
+def limit_model_threads(model):
+    """Désactiver le parallélisme interne du modèle (la concurrence est gérée par l'executor)"""
+    regressor = getattr(model, "regressor_", model)
+    for step in getattr(regressor, "named_steps", {}).values():
+        if "n_jobs" in step.get_params():
+            step.set_params(n_jobs=1)
+    return model
+
+# FORÊT COMPILÉE (bundle mmap optionnel, généré par pipeline/train.py)
+class CompiledForest:
+    """Évaluateur NumPy d'une forêt compilée par `compile_forest` (pipeline/train.py)
+
+    Tous les arbres sont parcourus simultanément : à chaque niveau, chaque ligne avance
+    d'un nœud dans chaque arbre. Les feuilles bouclent sur elles-mêmes, le nombre
+    d'itérations est donc fixe (profondeur maximale de la forêt).
+    """
+
+    def __init__(self, arrays):
+        self.feature_names = [str(name) for name in arrays["feature_names"]]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.max_depth = int(arrays["max_depth"])
+
+    @classmethod
+    def load(cls, directory: str) -> "CompiledForest":
+        """Ouvrir un bundle (répertoire de .npy + meta.json) en mémoire mappée
+
+        Aucune donnée n'est copiée : les pages des tableaux sont lues à la demande et
+        partagées entre processus via le cache disque. `feature_info` provient du bundle.
+        """
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != MODEL_BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"format de bundle non supporté: {meta.get('format_version')}")
+        # np.asarray : vue ndarray simple sur le memmap (évite le surcoût de la sous-classe)
+        arrays = {
+            name: np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+            for name in meta["arrays"]
+        }
+        forest = cls({**arrays, "feature_names": meta["feature_names"], "max_depth": meta["max_depth"]})
+        forest.feature_info = meta["feature_info"]
+        forest.model_sha256 = meta.get("model_sha256")
+        return forest
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Prédire les prix (MAD) pour une matrice de features (colonnes dans l'ordre `feature_names`)"""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        n_rows, n_features = X.shape
+        x_flat = X.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[:, None]
+
+        nodes = np.tile(self.roots, (n_rows, 1))
+        for _ in range(self.max_depth):
+            go_right = x_flat[self.feature[nodes] + row_offsets] >= self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+
+        # Somme arbre par arbre dans le même ordre que sklearn, puis moyenne et expm1
+        log_prediction = np.add.accumulate(self.value[nodes.T], axis=0)[-1] / len(self.roots)
+        return np.expm1(log_prediction)
+
+# ADAPTATEUR NUMPY (évite la construction d'un DataFrame par requête)
+class NumpyModelAdapter:
+    """Alimenter directement le scaler et la forêt du pipeline sklearn avec une matrice NumPy
+
+    Reproduit `TransformedTargetRegressor` → `ColumnTransformer` → `StandardScaler` → forêt
+    sans DataFrame. Lève ValueError si le pipeline ne s'y prête pas (variables catégorielles,
+    autre transformation), auquel cas l'API garde le chemin DataFrame.
+    """
+
+    def __init__(self, model, columns: List[str]):
+        regressor = model.regressor_
+        scaler = regressor.named_steps["preprocessor"].named_transformers_["num"]
+        self.forest = regressor.named_steps["model"]
+        if list(getattr(scaler, "feature_names_in_", [])) != list(columns):
+            raise ValueError("colonnes différentes du préprocesseur")
+        if self.forest.n_features_in_ != len(columns):
+            raise ValueError("variables catégorielles non supportées")
+        self.columns = list(columns)
+        self.mean = scaler.mean_
+        self.scale = scaler.scale_
+        self.inverse_func = model.inverse_func
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Prédire les prix (MAD) pour une matrice de features (colonnes dans l'ordre `columns`)"""
+        X_scaled = (X - self.mean) / self.scale
+        return self.inverse_func(self.forest.predict(X_scaled))
+
+def file_sha256(path: str) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# MODÈLE SERVI (remplaçable à chaud)
+class ServingModel:
+    """Artefacts d'une version du modèle, remplacés d'un bloc au rechargement
+
+    Une requête garde la référence obtenue à son début : elle se termine sur cette
+    version (prédiction, clé de cache, réponse) même si un rechargement a lieu entre-temps.
+    """
+
+    def __init__(self, version: str, model_path: Optional[str] = None,
+                 feature_info_path: Optional[str] = None):
+        self.version = version
+        self.model_path = model_path
+        self.feature_info_path = feature_info_path
+        self.model = None
+        self.feature_info = None
+        self.adapter = None
+        self.compiled = None
+        self.load_timings = {}  # artefact -> durée de chargement (s), exportée dans model_load_seconds
+        self.fingerprint = None  # empreinte des artefacts (connue après un rechargement)
+        self._lock = threading.Lock()
+        self._load_failed = False
+
+    @classmethod
+    def load(cls, version: str, model_path: Optional[str], feature_info_path: Optional[str],
+             bundle_path: Optional[str] = None) -> "ServingModel":
+        """Ouvrir le bundle (mmap) s'il est fourni, sinon désérialiser le pipeline sklearn"""
+        serving = cls(version, model_path, feature_info_path)
+        if bundle_path:
+            try:
+                start = time.perf_counter()
+                serving.compiled = CompiledForest.load(bundle_path)
+                serving.feature_info = serving.compiled.feature_info
+                serving.load_timings["bundle"] = time.perf_counter() - start
+                logger.info(
+                    f"✅ Bundle du modèle ouvert (mmap) - Version: {version} - "
+                    f"{len(serving.compiled.roots)} arbres en {serving.load_timings['bundle'] * 1000:.1f} ms"
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Bundle du modèle non utilisé: {e}")
+                serving.compiled = None
+
+        # Sans bundle, le pipeline sklearn est chargé tout de suite
+        if serving.compiled is None:
+            serving.load_sklearn_model()
+        return serving
+
+    @property
+    def available(self) -> bool:
+        """Un modèle peut servir des prédictions (pipeline sklearn ou bundle compilé)"""
+        return self.model is not None or self.compiled is not None
+
+    def load_sklearn_model(self):
+        """Désérialiser le pipeline sklearn (joblib) et préparer l'adaptateur NumPy"""
+        start = time.perf_counter()
+        loaded = limit_model_threads(joblib.load(self.model_path))
+        if self.feature_info is None:
+            self.feature_info = joblib.load(self.feature_info_path)
+        self.load_timings["joblib"] = time.perf_counter() - start
+        try:
+            self.adapter = NumpyModelAdapter(loaded, self.feature_info["num_cols"])
+        except Exception as e:
+            logger.warning(f"⚠️ Adaptateur NumPy non utilisé, chemin DataFrame conservé: {e}")
+        self.model = loaded
+        logger.info(f"✅ Modèle chargé - Version: {self.version} ({self.load_timings['joblib']:.2f}s)")
+
+    def model_sha256(self) -> Optional[str]:
+        """Empreinte de rf_model.joblib : celle enregistrée dans le bundle, sinon celle de MODEL_PATH"""
+        if self.compiled is not None and self.compiled.model_sha256:
+            return self.compiled.model_sha256
+        if self.model_path and os.path.isfile(self.model_path):
+            return file_sha256(self.model_path)
+        return None
+
+    def get_model(self):
+        """Pipeline sklearn ; avec un bundle, il n'est désérialisé qu'au premier lot qui en a besoin"""
+        if self.model is None and not self._load_failed:
+            with self._lock:
+                if self.model is None and not self._load_failed:
+                    try:
+                        self.load_sklearn_model()
+                        model_load_seconds.labels(artifact="joblib").set(self.load_timings["joblib"])
+                    except Exception as e:
+                        self._load_failed = True
+                        logger.warning(f"⚠️ Pipeline sklearn indisponible, forêt compilée utilisée pour tous les lots: {e}")
+        return self.model
+
+    def predict(self, cars: List["CarFeatures"]):
+        """Construire les features et prédire (exécuté dans l'executor d'inférence)
+
+        La forêt compilée est plus rapide pour les petits lots ; au-delà de
+        COMPILED_MAX_ROWS, le parcours Cython de sklearn reprend l'avantage.
+        Le DataFrame n'est construit que si le pipeline l'exige. Avec un bundle, le pipeline
+        sklearn n'est chargé qu'au premier lot dépassant COMPILED_MAX_ROWS.
+        """
+        if self.compiled is not None and len(cars) <= COMPILED_MAX_ROWS:
+            predictor, columns = self.compiled.predict, self.compiled.feature_names
+        elif (sklearn_model := self.get_model()) is None:
+            predictor, columns = self.compiled.predict, self.compiled.feature_names
+        elif self.adapter is not None:
+            predictor, columns = self.adapter.predict, self.adapter.columns
+        else:
+            predictor, columns = sklearn_model.predict, None
+
+        with stage_timer("features"):
+            X = build_features(cars) if columns is None else build_feature_matrix(cars, columns)
+        with stage_timer("model"):
+            return predictor(X)
+
 try:
-    model = joblib.load(MODEL_PATH)
-    feature_info = joblib.load(FEATURE_INFO_PATH)
-    logger.info(f"✅ Modèle chargé - Version: {MODEL_VERSION}")
+    serving_model = ServingModel.load(MODEL_VERSION, MODEL_PATH, FEATURE_INFO_PATH, MODEL_BUNDLE_PATH)
 except Exception as e:
     logger.error(f"❌ Erreur chargement modèle: {e}")
-    model = None
-    feature_info = None
+    serving_model = ServingModel(MODEL_VERSION, MODEL_PATH, FEATURE_INFO_PATH)
 
 # MÉTRIQUES PROMETHEUS
 # Compteurs
@@ -82,31 +377,235 @@ cache_misses = Counter(
     'cache_misses_total',
     'Nombre de miss cache Redis'
 )
+lookup_table_hits = Counter(
+    'lookup_table_hits_total',
+    'Nombre de prédictions servies par la table précalculée'
+)
+l1_cache_hits = Counter(
+    'l1_cache_hits_total',
+    'Nombre de hits du cache local (L1)'
+)
+l1_cache_misses = Counter(
+    'l1_cache_misses_total',
+    'Nombre de miss du cache local (L1)'
+)
+l1_cache_evictions = Counter(
+    'l1_cache_evictions_total',
+    'Nombre d\'entrées évincées du cache local (L1)'
+)
 errors_total = Counter(
     'errors_total',
     'Nombre total d\'erreurs',
     ['error_type']
 )
+model_reloads_total = Counter(
+    'model_reloads_total',
+    'Nombre de rechargements à chaud du modèle',
+    ['status']
+)
+
+prediction_logs_written = Counter(
+    'prediction_logs_written_total',
+    'Nombre de logs de prédiction écrits',
+    ['sink']
+)
+prediction_logs_dropped = Counter(
+    'prediction_logs_dropped_total',
+    'Nombre de logs de prédiction perdus',
+    ['reason']
+)
 
 # Histogramme pour latence
 prediction_duration = Histogram(
     'prediction_duration_seconds',
     'Durée des prédictions en secondes'
 )
+batch_prediction_duration = Histogram(
+    'batch_prediction_duration_seconds',
+    'Durée des prédictions par lot en secondes'
+)
+batch_size = Histogram(
+    'batch_size',
+    'Nombre de voitures par requête de prédiction par lot',
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 5000)
+)
+micro_batch_size = Histogram(
+    'micro_batch_size',
+    'Nombre de prédictions unitaires regroupées par appel au modèle',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+micro_batch_queue_wait = Histogram(
+    'micro_batch_queue_wait_seconds',
+    'Attente d\'une prédiction unitaire avant le départ de son lot',
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+)
+prediction_stage_duration = Histogram(
+    'prediction_stage_duration_seconds',
+    'Durée de chaque étape d\'une prédiction en secondes',
+    ['stage'],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+             0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
 
 # Gauges pour état système
 model_loaded = Gauge(
     'model_loaded',
-    'Modèle chargé (1) ou non (0)'
+    'Modèle chargé (1) ou non (0)',
+    multiprocess_mode='max'
 )
 redis_connected = Gauge(
     'redis_connected',
-    'Redis connecté (1) ou non (0)'
+    'Redis connecté (1) ou non (0)',
+    multiprocess_mode='max'
 )
+prediction_log_queue_size = Gauge(
+    'prediction_log_queue_size',
+    'Nombre de logs de prédiction en attente d\'écriture',
+    multiprocess_mode='livesum'
+)
+l1_cache_entries = Gauge(
+    'l1_cache_entries',
+    'Nombre d\'entrées dans le cache local (L1)',
+    multiprocess_mode='livesum'
+)
+model_load_seconds = Gauge(
+    'model_load_seconds',
+    'Durée de chargement du modèle en secondes, par artefact (bundle mmap ou joblib)',
+    ['artifact'],
+    multiprocess_mode='max'
+)
+
+stage_histograms = {}  # étape -> histogramme étiqueté (évite labels() à chaque mesure)
+
+@contextmanager
+def stage_timer(stage: str):
+    """Mesurer une étape d'une prédiction (histogramme par étape, et span si les traces sont activées)"""
+    histogram = stage_histograms.get(stage)
+    if histogram is None:
+        histogram = stage_histograms[stage] = prediction_stage_duration.labels(stage=stage)
+    span = tracer.start_as_current_span(stage) if tracer is not None else nullcontext()
+    start = time.perf_counter()
+    try:
+        with span:
+            yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
 
 # Initialiser les gauges
-model_loaded.set(1 if model else 0)
-redis_connected.set(1 if redis_client else 0)
+model_loaded.set(1 if serving_model.available else 0)
+redis_connected.set(0)
+for artifact, seconds in serving_model.load_timings.items():
+    model_load_seconds.labels(artifact=artifact).set(seconds)
+
+# TABLE DE PRÉDICTIONS PRÉCALCULÉES (optionnelle, générée par pipeline/train.py)
+class PredictionLookupTable:
+    """Prédictions précalculées sur une grille bornée, ouvertes en mémoire mappée
+
+    L'index d'une voiture est calculé par arithmétique sur les axes (min, max, pas) ;
+    en mode "observed", seuls les index présents dans `keys.npy` sont disponibles.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        self.mode = meta["mode"]
+        self.model_sha256 = meta.get("model_sha256")
+        self.values = np.load(os.path.join(directory, "values.npy"), mmap_mode="r")
+        self.keys = np.load(os.path.join(directory, "keys.npy"), mmap_mode="r") if self.mode == "observed" else None
+
+        # (feature, min, pas, taille, stride) pour chaque axe, dans l'ordre de la grille
+        self.axes = []
+        stride = 1
+        for name, size in reversed(list(zip(meta["features"], meta["sizes"]))):
+            low, _, step = meta["axes"][name]
+            self.axes.append((name, low, step, size, stride))
+            stride *= size
+        self.axes.reverse()
+
+    def get(self, car: "CarFeatures") -> Optional[float]:
+        """Prix précalculé si la voiture tombe exactement sur la grille, sinon None"""
+        index = 0
+        for name, low, step, size, stride in self.axes:
+            offset, remainder = divmod(getattr(car, name) - low, step)
+            if remainder or not 0 <= offset < size:
+                return None
+            index += offset * stride
+
+        if self.keys is not None:
+            position = int(np.searchsorted(self.keys, index))
+            if position == len(self.keys) or self.keys[position] != index:
+                return None
+            index = position
+        return float(self.values[index])
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+def open_lookup_table(serving: ServingModel) -> Optional[PredictionLookupTable]:
+    """Ouvrir la table précalculée, refusée si elle n'a pas été générée pour le modèle servi"""
+    if not LOOKUP_TABLE_PATH or not serving.available:
+        return None
+    try:
+        table = PredictionLookupTable(LOOKUP_TABLE_PATH)
+        expected = serving.model_sha256()
+        if table.model_sha256 is None or table.model_sha256 != expected:
+            raise ValueError(
+                f"générée pour un autre modèle ({str(table.model_sha256)[:8]} ≠ {str(expected)[:8]}), "
+                "à régénérer avec pipeline/train.py"
+            )
+    except Exception as e:
+        logger.warning(f"⚠️ Table de prédictions non utilisée: {e}")
+        return None
+    logger.info(f"✅ Table de prédictions chargée ({table.mode}, {len(table)} valeurs)")
+    return table
+
+lookup_table = open_lookup_table(serving_model)
+
+# CACHE LOCAL (L1)
+class LocalCache:
+    """Cache LRU en mémoire avec expiration (TTL), consulté avant Redis"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Retourner la valeur si présente et non expirée"""
+        entry = self._entries.get(key)
+        if entry is None:
+            l1_cache_misses.inc()
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            l1_cache_entries.set(len(self._entries))
+            l1_cache_misses.inc()
+            return None
+        self._entries.move_to_end(key)
+        l1_cache_hits.inc()
+        return value
+
+    def set(self, key: str, value: dict):
+        """Ajouter une valeur, en évinçant la moins récemment utilisée si plein"""
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            l1_cache_evictions.inc()
+        l1_cache_entries.set(len(self._entries))
+
+    def clear(self):
+        """Vider le cache"""
+        self._entries.clear()
+        l1_cache_entries.set(0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+local_cache = LocalCache(L1_CACHE_SIZE, L1_CACHE_TTL)
 
 # MODÈLES PYDANTIC
 class CarFeatures(BaseModel):
@@ -123,7 +622,7 @@ class CarFeatures(BaseModel):
         }
     }
     
-    year: int = Field(..., ge=1990, le=2025, description="Année de fabrication")
+    year: int = Field(..., ge=1990, le=CURRENT_YEAR, description="Année de fabrication")
     max_power_bhp: int = Field(..., ge=0, description="Puissance maximale (chevaux)")
     torque_nm: int = Field(..., ge=0, description="Couple moteur (Nm)")
     engine_cc: int = Field(..., ge=0, description="Cylindrée du moteur (cm³)")
@@ -139,31 +638,625 @@ class PredictionResponse(BaseModel):
     prediction_id: str
     timestamp: str
 
+class BatchPredictionResponse(BaseModel):
+    predictions: List[PredictionResponse] = Field(..., description="Prédictions dans l'ordre des entrées")
+    count: int = Field(..., description="Nombre de voitures traitées")
+    cached_count: int = Field(..., description="Nombre de prédictions servies depuis le cache")
+
+class ModelReloadRequest(BaseModel):
+    model_config = {"protected_namespaces": ()}
+
+    model_version: Optional[str] = Field(
+        None, description="Version à servir (par défaut : dérivée du contenu des artefacts)"
+    )
+
 # FONCTIONS UTILITAIRES
-def generate_cache_key(features: dict) -> str:
-    """Générer une clé de cache unique basée sur les features"""
-    features_str = json.dumps(features, sort_keys=True)
-    return f"prediction:{hashlib.md5(features_str.encode()).hexdigest()}"
+def generate_cache_key(features: dict, version: Optional[str] = None) -> str:
+    """Générer une clé de cache canonique, préfixée par la version du modèle
+
+    Format : prediction:{MODEL_VERSION}:{year}:{max_power_bhp}:{torque_nm}:{engine_cc}
+    Les features sont des entiers validés par Pydantic : la clé est canonique sans
+    sérialisation JSON ni hachage, et un nouveau modèle ne relit jamais d'anciens prix.
+    `version` : celle du modèle qui sert la requête (par défaut MODEL_VERSION).
+    """
+    return (
+        f"prediction:{version or MODEL_VERSION}:{features['year']}:{features['max_power_bhp']}"
+        f":{features['torque_nm']}:{features['engine_cc']}"
+    )
+
+def car_inputs(cars: List[CarFeatures]) -> dict:
+    """Tableaux NumPy des features saisies (un par feature, une valeur par voiture)"""
+    return {
+        name: np.fromiter((getattr(car, name) for car in cars), dtype=np.int64, count=len(cars))
+        for name in INPUT_FEATURES
+    }
+
+def build_features(cars: List[CarFeatures]) -> pd.DataFrame:
+    """Construire le DataFrame de features (une ligne par voiture), comme à l'entraînement"""
+    return feature_frame(car_inputs(cars))
+
+def build_feature_matrix(cars: List[CarFeatures], columns: List[str]) -> np.ndarray:
+    """Construire la matrice NumPy des features dans l'ordre des colonnes du modèle"""
+    return feature_matrix(car_inputs(cars), columns)
+
+def predict_cars(cars: List[CarFeatures], serving: Optional[ServingModel] = None):
+    """Prédire avec le modèle donné (par défaut, le modèle servi actuellement)"""
+    return (serving or serving_model).predict(cars)
+
+async def run_inference(cars: List[CarFeatures], serving: Optional[ServingModel] = None):
+    """Exécuter la prédiction sans bloquer la boucle asyncio"""
+    loop = asyncio.get_running_loop()
+    if tracer is not None:
+        # Les spans du thread d'inférence restent rattachés à la requête
+        return await loop.run_in_executor(
+            get_inference_executor(), contextvars.copy_context().run, predict_cars, cars, serving
+        )
+    return await loop.run_in_executor(get_inference_executor(), predict_cars, cars, serving)
+
+# MICRO-BATCHING DES PRÉDICTIONS UNITAIRES (optionnel)
+class MicroBatcher:
+    """Regrouper les prédictions unitaires concurrentes en un seul appel vectorisé
+
+    Le premier miss ouvre une fenêtre de MICRO_BATCH_WINDOW_MS ; les miss arrivés
+    pendant la fenêtre sont prédits ensemble (au plus MICRO_BATCH_MAX_SIZE, le lot part
+    dès qu'il est plein) et chaque requête reçoit sa propre prédiction.
+    """
+
+    def __init__(self, window: float, max_size: int):
+        self.window = window
+        self.max_size = max_size
+        self._pending = []  # (modèle servi, voiture, future, instant d'arrivée)
+        self._timer = None
+        self._tasks = set()  # références fortes : la boucle ne garde que des références faibles
+
+    async def predict(self, car: CarFeatures, serving: ServingModel) -> float:
+        """Prédire une voiture au sein du prochain lot"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((serving, car, future, time.perf_counter()))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        """Fermer la fenêtre et lancer un appel au modèle par version servie"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+
+        # Un rechargement pendant la fenêtre : chaque requête garde sa version
+        groups = {}
+        for item in pending:
+            groups.setdefault(id(item[0]), []).append(item)
+        for items in groups.values():
+            task = asyncio.ensure_future(self._run(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items: list):
+        now = time.perf_counter()
+        micro_batch_size.observe(len(items))
+        for _, _, _, enqueued_at in items:
+            micro_batch_queue_wait.observe(now - enqueued_at)
+
+        try:
+            predictions = await run_inference([car for _, car, _, _ in items], items[0][0])
+        except Exception as e:
+            for _, _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future, _), prediction in zip(items, predictions):
+            if not future.done():
+                future.set_result(prediction)
+
+micro_batcher = MicroBatcher(MICRO_BATCH_WINDOW_MS / 1000, MICRO_BATCH_MAX_SIZE) if MICRO_BATCH_WINDOW_MS > 0 else None
+
+class PredictionIdGenerator:
+    """Identifiants de prédiction uniques, croissants et triables (type Snowflake)
+
+    96 bits écrits en 24 caractères hexadécimaux, dans l'ordre :
+    horodatage en ms (44 bits) | worker (38 bits) | séquence dans la milliseconde (14 bits).
+    Le worker combine un nœud (16 bits : WORKER_ID si défini, sinon l'hôte) et le PID
+    (22 bits) : les workers d'un même conteneur restent distincts même avec WORKER_ID.
+    L'ordre lexicographique des IDs suit donc l'ordre chronologique.
+    """
+
+    WORKER_BITS = 38
+    NODE_BITS = 16
+    PID_BITS = 22
+    SEQUENCE_BITS = 14
+    MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+    def __init__(self, node_id: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._fixed_node_id = node_id
+        self.reset()
+
+    @classmethod
+    def default_node_id(cls) -> int:
+        """Identifiant du nœud par défaut : l'hôte (conteneur)"""
+        return zlib.crc32(socket.gethostname().encode())
+
+    def reset(self):
+        """Réinitialiser l'état (appelé aussi dans chaque processus fils après un fork)"""
+        node_id = self._fixed_node_id
+        if node_id is None:
+            node_id = self.default_node_id()
+        pid = os.getpid() & ((1 << self.PID_BITS) - 1)
+        self.worker_id = ((node_id & ((1 << self.NODE_BITS) - 1)) << self.PID_BITS) | pid
+        self.last_ms = 0
+        self.sequence = 0
+
+    def next_id(self) -> str:
+        """Générer l'ID suivant (thread-safe, sans hachage)"""
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self.last_ms:
+                self.last_ms = now_ms
+                self.sequence = 0
+            else:
+                # Même milliseconde (ou horloge reculée) : on reste monotone
+                self.sequence += 1
+                if self.sequence > self.MAX_SEQUENCE:
+                    self.last_ms += 1
+                    self.sequence = 0
+            value = (
+                (self.last_ms << (self.WORKER_BITS + self.SEQUENCE_BITS))
+                | (self.worker_id << self.SEQUENCE_BITS)
+                | self.sequence
+            )
+        return f"{value:024x}"
+
+prediction_ids = PredictionIdGenerator(int(WORKER_ID) if WORKER_ID else None)
+os.register_at_fork(after_in_child=prediction_ids.reset)
 
 def generate_prediction_id() -> str:
     """Générer un ID unique pour la prédiction"""
-    timestamp = datetime.now().isoformat()
-    return hashlib.sha256(timestamp.encode()).hexdigest()[:16]
+    return prediction_ids.next_id()
 
-def save_prediction_log(prediction_data: dict):
-    """Sauvegarder la prédiction dans Redis pour traçabilité"""
-    if not redis_client:
+def build_response_data(car_dict: dict, prediction: float, version: Optional[str] = None) -> dict:
+    """Préparer la réponse d'une nouvelle prédiction (ID et timestamp inclus)"""
+    return {
+        "predicted_price": round(float(prediction), 2),
+        "currency": "MAD",
+        "input_features": car_dict,
+        "model_version": version or MODEL_VERSION,
+        "cached": False,
+        "prediction_id": generate_prediction_id(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+# CACHE REDIS (lectures et écritures groupées)
+async def cache_get_many(keys: List[str]):
+    """Lire plusieurs clés de cache en un seul aller-retour Redis (MGET)
+
+    Retourne (prédictions en cache ou None, masque des hits) dans l'ordre des clés :
+    seules les voitures hors du masque sont envoyées au modèle. Redis indisponible
+    ou en erreur : tout est miss.
+    """
+    misses = [None] * len(keys)
+    if not redis_client or not keys:
+        return misses, [False] * len(keys)
+    try:
+        raw_values = await redis_client.mget(keys)
+    except Exception as e:
+        logger.warning(f"Erreur lecture cache: {e}")
+        return misses, [False] * len(keys)
+    values = []
+    for key, raw in zip(keys, raw_values):
+        value = None
+        if raw:
+            # Valeur illisible : traitée comme un miss, le reste du lot est servi
+            try:
+                value = json.loads(raw)
+            except ValueError as e:
+                logger.warning(f"Erreur lecture cache ({key}): {e}")
+        values.append(value)
+    return values, [value is not None for value in values]
+
+async def cache_set_many(entries: List[tuple]):
+    """Écrire plusieurs prédictions (clé, données) en un seul pipeline de SETEX"""
+    if not redis_client or not entries:
         return
-    
     try:
-        log_key = f"log:{prediction_data['prediction_id']}"
-        redis_client.setex(
-            log_key,
-            REDIS_TTL * 24,  # Garder les logs 24h
-            json.dumps(prediction_data)
-        )
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for cache_key, prediction_data in entries:
+                pipe.setex(cache_key, REDIS_TTL, json.dumps(prediction_data))
+            await pipe.execute()
+        logger.info(f"💾 {len(entries)} résultat(s) mis en cache")
     except Exception as e:
-        logger.warning(f"Erreur sauvegarde log: {e}")
+        logger.warning(f"Erreur écriture cache: {e}")
+
+async def persist_predictions(entries: List[tuple]):
+    """Mettre en cache et journaliser des prédictions, après l'envoi de la réponse
+
+    `entries` : liste de (clé de cache ou None, données de la prédiction).
+    Les entrées de cache sont écrites en un seul pipeline Redis ; les logs sont
+    confiés à l'écrivain en tâche de fond.
+    """
+    with stage_timer("persist"):
+        for _, prediction_data in entries:
+            prediction_log_writer.submit(prediction_data)
+
+        await cache_set_many([(key, data) for key, data in entries if key])
+
+# ÉCRIVAIN DE LOGS EN TÂCHE DE FOND
+class PredictionLogWriter:
+    """Journaliser les prédictions hors du chemin de la requête
+
+    Les logs passent par une file bornée (LOG_QUEUE_SIZE) ; une tâche de fond les écrit
+    par lots de LOG_BATCH_SIZE ou toutes les LOG_FLUSH_INTERVAL secondes, dans Redis
+    (un pipeline par lot) et optionnellement dans un fichier JSONL en ajout seul.
+    File pleine : le log est abandonné et compté, la requête n'attend jamais.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float, file_path: Optional[str] = None):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.file_path = file_path
+        self.queue = None
+        self.task = None
+
+    def start(self):
+        """Démarrer la tâche de fond (dans la boucle asyncio courante)"""
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Écrire les logs restants puis arrêter la tâche de fond"""
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.queue = None
+        self.task = None
+        prediction_log_queue_size.set(0)
+
+    def submit(self, prediction_data: dict) -> bool:
+        """Mettre un log en file sans attendre ; False s'il est abandonné"""
+        if self.queue is None:
+            prediction_logs_dropped.labels(reason='writer_stopped').inc()
+            return False
+        try:
+            self.queue.put_nowait(prediction_data)
+        except asyncio.QueueFull:
+            prediction_logs_dropped.labels(reason='queue_full').inc()
+            return False
+        prediction_log_queue_size.set(self.queue.qsize())
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[dict]):
+        prediction_log_queue_size.set(self.queue.qsize())
+        if redis_client:
+            try:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    for prediction_data in batch:
+                        pipe.setex(
+                            f"log:{prediction_data['prediction_id']}",
+                            REDIS_TTL * 24,  # Garder les logs 24h
+                            json.dumps(prediction_data)
+                        )
+                    await pipe.execute()
+                prediction_logs_written.labels(sink='redis').inc(len(batch))
+            except Exception as e:
+                prediction_logs_dropped.labels(reason='redis_error').inc(len(batch))
+                logger.warning(f"Erreur sauvegarde logs: {e}")
+
+        if self.file_path:
+            lines = "".join(json.dumps(prediction_data) + "\n" for prediction_data in batch)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._append, lines)
+                prediction_logs_written.labels(sink='file').inc(len(batch))
+            except Exception as e:
+                prediction_logs_dropped.labels(reason='file_error').inc(len(batch))
+                logger.warning(f"Erreur écriture fichier de logs: {e}")
+
+    def _append(self, lines: str):
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+prediction_log_writer = PredictionLogWriter(LOG_QUEUE_SIZE, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_FILE_PATH)
+
+# RECHARGEMENT À CHAUD DU MODÈLE
+def smoke_batch() -> List[CarFeatures]:
+    """Lot de contrôle couvrant le domaine de l'API, prédit par tout modèle candidat"""
+    return [
+        CarFeatures(year=year, max_power_bhp=power, torque_nm=torque, engine_cc=cc)
+        for year in range(1995, 2026, 5)
+        for power, torque, cc in [(45, 80, 800), (90, 200, 1500), (180, 400, 2500)]
+    ]
+
+def artifact_paths() -> List[str]:
+    """Fichiers des artefacts du modèle servis par l'API"""
+    paths = [path for path in (MODEL_PATH, FEATURE_INFO_PATH) if path]
+    if MODEL_BUNDLE_PATH and os.path.isdir(MODEL_BUNDLE_PATH):
+        paths += [os.path.join(MODEL_BUNDLE_PATH, name) for name in sorted(os.listdir(MODEL_BUNDLE_PATH))]
+    return paths
+
+def artifact_signature() -> tuple:
+    """(chemin, mtime, taille) des artefacts : détecte un déploiement sans lire les fichiers"""
+    signature = []
+    for path in artifact_paths():
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+def artifact_fingerprint() -> str:
+    """Empreinte SHA-256 du contenu des artefacts (identique dans tous les workers)"""
+    digest = hashlib.sha256()
+    for path in artifact_paths():
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+def validate_model(serving: ServingModel):
+    """Contrôler un modèle candidat sur le lot de contrôle avant de le servir"""
+    cars = smoke_batch()
+    predictions = np.asarray(serving.predict(cars), dtype=np.float64)
+    if predictions.shape != (len(cars),):
+        raise ValueError(f"{predictions.shape} prédictions pour {len(cars)} voitures de contrôle")
+    if not np.all(np.isfinite(predictions)) or np.any(predictions <= 0):
+        raise ValueError("prix non finis ou négatifs sur le lot de contrôle")
+
+def reopen_lookup_table(serving: ServingModel) -> Optional[PredictionLookupTable]:
+    """Rouvrir la table précalculée, gardée seulement si elle concorde avec le nouveau modèle
+
+    En plus de l'empreinte, ses valeurs sont comparées au modèle sur le lot de contrôle.
+    """
+    table = open_lookup_table(serving)
+    if table is None:
+        return None
+    hits = [(car, price) for car in smoke_batch() if (price := table.get(car)) is not None]
+    if hits:
+        expected = serving.predict([car for car, _ in hits])
+        if not np.allclose(expected, [price for _, price in hits]):
+            logger.warning("⚠️ Table de prédictions générée pour un autre modèle, désactivée")
+            return None
+    return table
+
+def load_candidate_model(version: str):
+    """Charger et valider un nouveau modèle (dans un thread, hors de la boucle asyncio)"""
+    candidate = ServingModel.load(version, MODEL_PATH, FEATURE_INFO_PATH, MODEL_BUNDLE_PATH)
+    validate_model(candidate)
+    return candidate, reopen_lookup_table(candidate)
+
+reload_lock = None
+
+async def reload_model(version: Optional[str] = None) -> dict:
+    """Charger un nouveau modèle en arrière-plan, le valider puis le servir sans interruption
+
+    La bascule (modèle, table précalculée, MODEL_VERSION) se fait d'un bloc, sans `await` :
+    les requêtes en cours terminent sur la version qu'elles ont lue au départ. Sans version
+    explicite, elle est dérivée du contenu des artefacts, donc identique dans tous les workers.
+    """
+    global serving_model, lookup_table, MODEL_VERSION, reload_lock
+    if reload_lock is None:
+        reload_lock = asyncio.Lock()
+
+    async with reload_lock:
+        previous = serving_model
+        loop = asyncio.get_running_loop()
+        try:
+            fingerprint = await loop.run_in_executor(None, artifact_fingerprint)
+            if version is None and fingerprint == previous.fingerprint:
+                return {"status": "unchanged", "model_version": previous.version}
+            version = version or f"{MODEL_VERSION_BASE}-{fingerprint[:8]}"
+            if version == previous.version:
+                raise ValueError(f"la version {version} est déjà servie")
+            candidate, table = await loop.run_in_executor(None, load_candidate_model, version)
+        except Exception:
+            model_reloads_total.labels(status="failure").inc()
+            raise
+        candidate.fingerprint = fingerprint
+
+        serving_model, lookup_table, MODEL_VERSION = candidate, table, candidate.version
+
+    model_loaded.set(1)
+    for artifact, seconds in candidate.load_timings.items():
+        model_load_seconds.labels(artifact=artifact).set(seconds)
+    model_reloads_total.labels(status="success").inc()
+    logger.info(f"🔄 Modèle rechargé : {previous.version} → {candidate.version}")
+    return {"status": "reloaded", "previous_version": previous.version, "model_version": candidate.version}
+
+async def watch_model_artifacts(interval: float):
+    """Recharger le modèle quand ses artefacts changent sur disque"""
+    signature = artifact_signature()
+    while True:
+        await asyncio.sleep(interval)
+        current = artifact_signature()
+        if current == signature:
+            continue
+        signature = current
+        try:
+            await reload_model()
+        except Exception as e:
+            errors_total.labels(error_type='model_reload_error').inc()
+            logger.error(f"❌ Nouveau modèle refusé, version {serving_model.version} conservée: {e}")
+
+# SCORING EN FLUX (fichiers CSV / NDJSON)
+STREAM_EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson"}
+STREAM_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "ndjson",
+}
+
+def detect_stream_format(content_type: Optional[str], filename: Optional[str] = None) -> Optional[str]:
+    """Format d'entrée ("csv" ou "ndjson") d'après l'extension du fichier ou le Content-Type"""
+    if filename:
+        extension = os.path.splitext(filename)[1].lower()
+        if extension in STREAM_EXTENSIONS:
+            return STREAM_EXTENSIONS[extension]
+    if content_type:
+        return STREAM_CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    return None
+
+class StreamRecordReader:
+    """Lire un fichier CSV ou NDJSON par blocs d'enregistrements, en mémoire constante
+
+    Le CSV passe par un seul `csv.reader` sur tout le fichier : un champ entre guillemets
+    peut contenir des retours à la ligne. La taille d'un champ CSV (csv.field_size_limit)
+    et d'une ligne NDJSON (STREAM_MAX_LINE_CHARS) est bornée : au-delà, la ligne est en erreur.
+    Chaque enregistrement est un tuple (numéro de ligne, enregistrement, erreur ou None).
+    """
+
+    def __init__(self, binary_file, input_format: str):
+        self.input_format = input_format
+        self.text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+        self.row = 0
+        self.header = None
+        self.reader = csv.reader(self.text) if input_format == "csv" else None
+
+    def read(self, n: int) -> list:
+        """Lire jusqu'à n enregistrements (liste vide en fin de fichier)"""
+        records = []
+        while len(records) < n:
+            record = self._next_csv() if self.reader is not None else self._next_ndjson()
+            if record is None:
+                break
+            records.append(record)
+        return records
+
+    def _next_csv(self) -> Optional[tuple]:
+        while True:
+            try:
+                values = next(self.reader)
+            except StopIteration:
+                return None
+            except csv.Error as e:
+                self.row += 1
+                return self.row, {}, f"CSV invalide: {e}"
+            if not any(value.strip() for value in values):
+                continue
+            if self.header is None:
+                self.header = [name.strip() for name in values]
+                continue
+            self.row += 1
+            record = dict(zip(self.header, values))
+            if len(values) != len(self.header):
+                return self.row, record, f"{len(values)} colonnes au lieu de {len(self.header)}"
+            return self.row, record, None
+
+    def _next_ndjson(self) -> Optional[tuple]:
+        while True:
+            line = self.text.readline(STREAM_MAX_LINE_CHARS + 1)
+            if not line:
+                return None
+            if len(line) > STREAM_MAX_LINE_CHARS and not line.endswith("\n"):
+                # Ligne trop longue : le reste est lu et jeté par morceaux bornés
+                while line and not line.endswith("\n"):
+                    line = self.text.readline(STREAM_MAX_LINE_CHARS)
+                self.row += 1
+                return self.row, {}, f"ligne de plus de {STREAM_MAX_LINE_CHARS} caractères"
+            if not line.strip():
+                continue
+            self.row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                return self.row, {}, f"JSON invalide: {e}"
+            if not isinstance(record, dict):
+                return self.row, {}, "objet JSON attendu"
+            return self.row, record, None
+
+    def detach(self):
+        """Rendre le fichier sous-jacent sans le fermer"""
+        self.text.detach()
+
+def parse_stream_car(record: dict) -> CarFeatures:
+    """Valider les features d'un enregistrement (colonnes supplémentaires ignorées)"""
+    return CarFeatures(**{name: record.get(name) for name in CarFeatures.model_fields})
+
+async def score_stream(reader: StreamRecordReader, serving: ServingModel,
+                       output_format: str, chunk_size: int) -> AsyncIterator[str]:
+    """Scorer le fichier par blocs (un appel vectorisé par bloc) et émettre les résultats
+
+    Chaque ligne de sortie reprend l'enregistrement d'entrée, complété de `predicted_price`
+    ou de `error` ; seul le bloc courant est en mémoire.
+    """
+    loop = asyncio.get_running_loop()
+    columns = None
+    while True:
+        records = await loop.run_in_executor(None, reader.read, chunk_size)
+        if not records:
+            return
+
+        chunk = []
+        for row, record, error in records:
+            car = None
+            if error is None:
+                try:
+                    car = parse_stream_car(record)
+                except ValidationError as e:
+                    error = "; ".join(f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in e.errors())
+            chunk.append((row, record, car, error))
+
+        valid = [i for i, (_, _, car, _) in enumerate(chunk) if car is not None]
+        prices = {}
+        if valid:
+            predictions = await run_inference([chunk[i][2] for i in valid], serving)
+            prices = {i: round(float(price), 2) for i, price in zip(valid, predictions)}
+        predictions_total.inc(len(valid))
+        if len(valid) < len(chunk):
+            errors_total.labels(error_type='stream_invalid_row').inc(len(chunk) - len(valid))
+
+        output = io.StringIO()
+        if output_format == "csv":
+            writer = csv.writer(output, lineterminator="\n")
+            if columns is None:
+                first = next((record for _, record, _, _ in chunk if record), None)
+                columns = ["row"] + list(first or CarFeatures.model_fields) + ["predicted_price", "error"]
+                writer.writerow(columns)
+            for i, (row, record, _, error) in enumerate(chunk):
+                writer.writerow([row] + [record.get(name, "") for name in columns[1:-2]]
+                                + [prices.get(i, ""), error or ""])
+        else:
+            for i, (row, record, _, error) in enumerate(chunk):
+                result = {"row": row, **record}
+                if error is None:
+                    result["predicted_price"] = prices[i]
+                else:
+                    result["error"] = error
+                output.write(json.dumps(result) + "\n")
+        yield output.getvalue()
 
 # ENDPOINTS
 @app.get("/", tags=["Root"])
@@ -175,6 +1268,9 @@ async def root():
         "endpoints": {
             "health": "/health",
             "predict": "/predict",
+            "predict_batch": "/predict/batch",
+            "predict_stream": "/predict/stream",
+            "reload_model": "/admin/reload-model",
             "metrics": "/metrics",
             "docs": "/docs"
         }
@@ -183,27 +1279,32 @@ async def root():
 @app.get("/health", tags=["Health"])
 async def health_check():
     """Vérifier l'état de santé du service"""
-    if model is None:
+    if not serving_model.available:
         raise HTTPException(status_code=503, detail="Modèle non chargé")
     
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
-        "model_version": MODEL_VERSION,
-        "features_loaded": feature_info is not None,
+        "model_loaded": serving_model.available,
+        "model_version": serving_model.version,
+        "features_loaded": serving_model.feature_info is not None,
         "redis_connected": redis_client is not None
     }
 
 @app.get("/metrics", tags=["Monitoring"])
 async def metrics():
     """Endpoint pour Prometheus - expose les métriques"""
+    # Plusieurs workers gunicorn : agréger les métriques de tous les processus
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return Response(
         content=generate_latest(),
         media_type=CONTENT_TYPE_LATEST
     )
 
 @app.post("/predict", response_model=PredictionResponse, tags=["Prediction"])
-async def predict_price(car: CarFeatures):
+async def predict_price(car: CarFeatures, background_tasks: BackgroundTasks):
     """
     Prédire le prix d'une voiture d'occasion
 
@@ -212,70 +1313,69 @@ async def predict_price(car: CarFeatures):
     - **torque_nm**: Couple moteur (Nm)
     - **engine_cc**: Cylindrée du moteur (cm³)
     """
-    if model is None:
+    # Version servie figée pour toute la requête (rechargement à chaud possible entre-temps)
+    serving, table = serving_model, lookup_table
+    if not serving.available:
         errors_total.labels(error_type='model_not_loaded').inc()
         raise HTTPException(status_code=503, detail="Le modèle n'est pas disponible")
 
     try:
         predictions_total.inc()
-        car_dict = car.dict()
-        cache_key = generate_cache_key(car_dict)
-        cached = False
+        with stage_timer("cache_key"):
+            car_dict = car.dict()
+            cache_key = generate_cache_key(car_dict, serving.version)
 
         with prediction_duration.time():  # <<-- Mesure de latence Prometheus
+            # Vérifier le cache local (L1)
+            with stage_timer("l1_cache"):
+                result = local_cache.get(cache_key)
+            if result:
+                return PredictionResponse(**{**result, "cached": True})
+
+            # Table précalculée : réponse par arithmétique d'index, sans modèle ni Redis
+            if table is not None:
+                with stage_timer("lookup_table"):
+                    table_price = table.get(car)
+                if table_price is not None:
+                    lookup_table_hits.inc()
+                    with stage_timer("response"):
+                        response_data = build_response_data(car_dict, table_price, serving.version)
+                    background_tasks.add_task(persist_predictions, [(None, response_data)])
+                    return PredictionResponse(**response_data)
+
             # Vérifier le cache Redis
             if redis_client:
                 try:
-                    cached_result = redis_client.get(cache_key)
-                    if cached_result:
+                    with stage_timer("redis_get"):
+                        cached_result = await redis_client.get(cache_key)
+                        result = json.loads(cached_result) if cached_result else None
+                    if result:
                         cache_hits.inc()
-                        cached = True
-                        result = json.loads(cached_result)
+                        result["cached"] = True
+                        local_cache.set(cache_key, result)
                         logger.info(f"✅ Cache HIT pour {car.year}")
                         return PredictionResponse(**result)
                 except Exception as e:
                     logger.warning(f"Erreur lecture cache: {e}")
 
-            # Cache MISS - Créer les features
+            # Cache MISS
             cache_misses.inc()
-            vehicle_age = 2025 - car.year
-            input_data = pd.DataFrame([{
-                'vehicle_age': float(vehicle_age),
-                'year': int(car.year),
-                'max_power_bhp': float(car.max_power_bhp),
-                'torque_nm': float(car.torque_nm),
-                'engine_cc': float(car.engine_cc)
-            }])
-
-            # Prédiction
-            prediction = model.predict(input_data)[0]
-            predicted_price = round(float(prediction), 2)
-
-            # Générer l'ID et timestamp
-            prediction_id = generate_prediction_id()
-            timestamp = datetime.now().isoformat()
-
-            # Préparer la réponse
-            response_data = {
-                "predicted_price": predicted_price,
-                "currency": "MAD",
-                "input_features": car_dict,
-                "model_version": MODEL_VERSION,
-                "cached": cached,
-                "prediction_id": prediction_id,
-                "timestamp": timestamp
-            }
-
-            # Sauvegarder dans Redis
-            if redis_client:
-                try:
-                    redis_client.setex(cache_key, REDIS_TTL, json.dumps(response_data))
-                    logger.info("💾 Résultat mis en cache")
-                except Exception as e:
-                    logger.warning(f"Erreur écriture cache: {e}")
 
-            # Sauvegarder le log
-            save_prediction_log(response_data)
+            # Prédiction (hors de la boucle asyncio), regroupée avec les miss concurrents si activé
+            with stage_timer("inference"):
+                if micro_batcher is not None:
+                    prediction = await micro_batcher.predict(car, serving)
+                else:
+                    prediction = (await run_inference([car], serving))[0]
+
+            # Préparer la réponse (ID et timestamp)
+            with stage_timer("response"):
+                response_data = build_response_data(car_dict, prediction, serving.version)
+                predicted_price = response_data["predicted_price"]
+
+                # Cache local immédiat ; cache Redis + log en un seul pipeline, après la réponse
+                local_cache.set(cache_key, response_data)
+            background_tasks.add_task(persist_predictions, [(cache_key, response_data)])
             logger.info(f"✅ Prédiction: {predicted_price} MAD pour {car.year}")
 
         return PredictionResponse(**response_data)
@@ -285,6 +1385,158 @@ async def predict_price(car: CarFeatures):
         logger.error(f"❌ Erreur prédiction: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction: {str(e)}")
     
+@app.post("/predict/batch", response_model=BatchPredictionResponse, tags=["Prediction"])
+async def predict_batch(cars: List[CarFeatures], background_tasks: BackgroundTasks):
+    """
+    Prédire le prix d'un lot de voitures en un seul appel au modèle
+
+    - Les prédictions sont renvoyées dans l'ordre des entrées
+    - Les voitures déjà en cache ne sont pas recalculées (Redis : un MGET en lecture,
+      un pipeline de SETEX en écriture, quelle que soit la taille du lot)
+    - Toutes les voitures absentes du cache sont prédites en un seul `model.predict`
+    """
+    # Version servie figée pour toute la requête (rechargement à chaud possible entre-temps)
+    serving, table = serving_model, lookup_table
+    if not serving.available:
+        errors_total.labels(error_type='model_not_loaded').inc()
+        raise HTTPException(status_code=503, detail="Le modèle n'est pas disponible")
+
+    if not cars:
+        raise HTTPException(status_code=422, detail="Le lot doit contenir au moins une voiture")
+    if len(cars) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop volumineux: {len(cars)} voitures (maximum {BATCH_MAX_SIZE})"
+        )
+
+    try:
+        predictions_total.inc(len(cars))
+        batch_size.observe(len(cars))
+        car_dicts = [car.dict() for car in cars]
+        cache_keys = [generate_cache_key(car_dict, serving.version) for car_dict in car_dicts]
+        results: List[Optional[dict]] = [None] * len(cars)
+        writes = []  # (clé de cache ou None, données) écrites après la réponse
+
+        with batch_prediction_duration.time():
+            # Vérifier le cache local (L1)
+            for i, cache_key in enumerate(cache_keys):
+                result = local_cache.get(cache_key)
+                if result:
+                    results[i] = {**result, "cached": True}
+            n_local_hits = sum(result is not None for result in results)
+
+            # Table précalculée (aucun calcul, aucun accès Redis)
+            n_table_hits = 0
+            if table is not None:
+                for i, car in enumerate(cars):
+                    if results[i] is not None:
+                        continue
+                    table_price = table.get(car)
+                    if table_price is not None:
+                        results[i] = build_response_data(car_dicts[i], table_price, serving.version)
+                        writes.append((None, results[i]))
+                        n_table_hits += 1
+                lookup_table_hits.inc(n_table_hits)
+
+            # Cache Redis pour les voitures restantes : un seul MGET, quel que soit le lot
+            remaining = [i for i, result in enumerate(results) if result is None]
+            cached_results, hits = await cache_get_many([cache_keys[i] for i in remaining])
+            for i, result, hit in zip(remaining, cached_results, hits):
+                if hit:
+                    result["cached"] = True
+                    results[i] = result
+                    local_cache.set(cache_keys[i], result)
+
+            # Cache MISS - une seule prédiction vectorisée (doublons calculés une fois)
+            miss_indices = {}
+            for i, cache_key in enumerate(cache_keys):
+                if results[i] is None:
+                    miss_indices.setdefault(cache_key, []).append(i)
+
+            n_misses = sum(len(idx) for idx in miss_indices.values())
+            n_hits = len(cars) - n_misses - n_table_hits
+            cache_hits.inc(n_hits - n_local_hits)
+            cache_misses.inc(n_misses)
+
+            if miss_indices:
+                unique_keys = list(miss_indices)
+                predictions = await run_inference([cars[miss_indices[key][0]] for key in unique_keys], serving)
+
+                for cache_key, prediction in zip(unique_keys, predictions):
+                    for n, i in enumerate(miss_indices[cache_key]):
+                        results[i] = build_response_data(car_dicts[i], prediction, serving.version)
+                        # Doublons : une seule écriture de cache, un log par prédiction
+                        writes.append((cache_key if n == 0 else None, results[i]))
+                    local_cache.set(cache_key, results[miss_indices[cache_key][0]])
+
+            background_tasks.add_task(persist_predictions, writes)
+
+            logger.info(f"✅ Lot de {len(cars)} prédictions ({n_hits} depuis le cache)")
+
+        return BatchPredictionResponse(
+            predictions=[PredictionResponse(**result) for result in results],
+            count=len(cars),
+            cached_count=n_hits
+        )
+
+    except Exception as e:
+        errors_total.labels(error_type='batch_prediction_error').inc()
+        logger.error(f"❌ Erreur prédiction par lot: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction par lot: {str(e)}")
+
+@app.post("/predict/stream", tags=["Prediction"])
+async def predict_stream(
+    request: Request,
+    output_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    input_format: Optional[str] = Query(None, pattern="^(ndjson|csv)$")
+):
+    """
+    Scorer un fichier CSV ou NDJSON (inventaire de concessionnaire) en flux
+
+    - Fichier envoyé en multipart (champ `file`)
+    - Lecture et scoring par blocs de STREAM_CHUNK_SIZE lignes, un appel vectorisé par bloc
+    - Résultats renvoyés au fil de l'eau en NDJSON (défaut) ou en CSV (`?format=csv`)
+    - Une ligne invalide reçoit un champ `error`, sans interrompre le flux
+    """
+    serving = serving_model
+    if not serving.available:
+        errors_total.labels(error_type='model_not_loaded').inc()
+        raise HTTPException(status_code=503, detail="Le modèle n'est pas disponible")
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Envoyez le fichier en multipart/form-data (champ `file`)")
+
+    # Formulaire lu ici (et non par FastAPI) : le fichier reste ouvert pendant le flux.
+    # Starlette l'écrit sur disque au-delà de 1 Mo : mémoire constante.
+    form = await request.form()
+    upload = form.get("file")
+    if upload is None or isinstance(upload, str):
+        await form.close()
+        raise HTTPException(status_code=422, detail="Champ `file` manquant")
+    input_format = input_format or detect_stream_format(upload.content_type, upload.filename)
+    if input_format is None:
+        await form.close()
+        raise HTTPException(
+            status_code=415,
+            detail="Format non reconnu : envoyez du CSV ou du NDJSON (ou précisez input_format)"
+        )
+
+    reader = StreamRecordReader(upload.file, input_format)
+
+    async def body():
+        try:
+            async for part in score_stream(reader, serving, output_format, STREAM_CHUNK_SIZE):
+                yield part
+        except Exception as e:
+            errors_total.labels(error_type='stream_prediction_error').inc()
+            logger.error(f"❌ Erreur scoring en flux: {str(e)}")
+            raise
+        finally:
+            reader.detach()
+            await form.close()
+
+    media_type = "text/csv" if output_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"X-Model-Version": serving.version})
+
 @app.get("/prediction-logs/{prediction_id}", tags=["Logging"])
 async def get_prediction_log(prediction_id: str):
     """Récupérer le log d'une prédiction spécifique"""
@@ -296,7 +1548,7 @@ async def get_prediction_log(prediction_id: str):
     
     try:
         log_key = f"log:{prediction_id}"
-        log_data = redis_client.get(log_key)
+        log_data = await redis_client.get(log_key)
         
         if not log_data:
             raise HTTPException(
@@ -313,6 +1565,32 @@ async def get_prediction_log(prediction_id: str):
             detail=f"Erreur récupération log: {str(e)}"
         )
 
+@app.post("/admin/reload-model", tags=["Admin"])
+async def reload_model_endpoint(request: Optional[ModelReloadRequest] = None,
+                                x_admin_token: Optional[str] = Header(None)):
+    """
+    Recharger le modèle depuis ses artefacts sans redémarrer le service
+
+    - Le nouveau modèle est chargé en arrière-plan puis validé sur un lot de contrôle
+    - Les requêtes en cours terminent sur l'ancien modèle
+    - La version (clés de cache, réponses) change avec le modèle
+    """
+    # Fermé par défaut : sans ADMIN_TOKEN configuré, personne ne peut recharger le modèle
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Rechargement désactivé (ADMIN_TOKEN non configuré)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+
+    try:
+        return await reload_model(request.model_version if request else None)
+    except Exception as e:
+        errors_total.labels(error_type='model_reload_error').inc()
+        logger.error(f"❌ Nouveau modèle refusé, version {serving_model.version} conservée: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Nouveau modèle refusé, version {serving_model.version} conservée: {str(e)}"
+        )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,253 @@
+"""
+Benchmark de charge de l'API FastAPI (en processus, Redis simulé en mémoire)
+
+Pilote /predict et /predict/batch avec une concurrence et une distribution de clés
+configurables, puis enregistre débit et latences p50/p95/p99 en JSON pour comparer
+les commits entre eux.
+
+Distributions :
+- all-hit  : toutes les voitures sont en cache (cache préchauffé)
+- all-miss : chaque voiture est nouvelle (caches vides, aucune répétition)
+- zipf     : voitures tirées selon une loi de Zipf sur un catalogue (caches froids au départ)
+
+Usage (depuis la racine du projet, avec les variables d'environnement de l'API) :
+    python benchmarks/bench_api.py --requests 2000 --concurrency 32
+    python benchmarks/bench_api.py --compare benchmarks/results/<commit>.json
+
+Note : le transport ASGI de httpx attend la fin de l'application, tâches de fond
+comprises ; les latences incluent donc les écritures différées (cache Redis).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import app.main as main_module
+from tests.fake_redis import FakeRedis
+
+DISTRIBUTIONS = ["all-hit", "all-miss", "zipf"]
+PATHS = ["predict", "batch"]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def git_commit() -> str:
+    """Commit courant (ou 'unknown' hors dépôt git)"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(__file__), text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def make_catalog(n: int, offset: int = 0) -> list:
+    """Catalogue de voitures distinctes (l'offset garantit des clés jamais vues)"""
+    cars = []
+    for i in range(offset, offset + n):
+        cars.append({
+            "year": 1990 + i % 36,
+            "max_power_bhp": 40 + (i // 36) % 160,
+            "torque_nm": 80 + (i // (36 * 160)) % 300,
+            "engine_cc": 800 + i // (36 * 160 * 300)
+        })
+    return cars
+
+
+def sample_cars(distribution: str, n: int, catalog_size: int, zipf_s: float, rng, run_id: int) -> list:
+    """Suite de n voitures selon la distribution demandée"""
+    if distribution == "all-miss":
+        return make_catalog(n, offset=(run_id + 1) * 10_000_000)
+    catalog = make_catalog(catalog_size)
+    if distribution == "all-hit":
+        return [catalog[i] for i in rng.integers(0, catalog_size, n)]
+    ranks = np.arange(1, catalog_size + 1)
+    weights = 1.0 / ranks ** zipf_s
+    return [catalog[i] for i in rng.choice(catalog_size, size=n, p=weights / weights.sum())]
+
+
+def percentiles(latencies: list) -> dict:
+    values = np.array(latencies) * 1000
+    return {
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max())
+    }
+
+
+def rss_mb() -> float:
+    """Mémoire résidente du processus (Mo)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_state(redis_latency: float, l1_size: int):
+    """Repartir de caches vides"""
+    main_module.redis_client = FakeRedis(latency=redis_latency)
+    main_module.local_cache = main_module.LocalCache(l1_size, main_module.L1_CACHE_TTL)
+
+
+async def run_scenario(client, path: str, distribution: str, args, run_id: int) -> dict:
+    """Exécuter un scénario et mesurer chaque requête"""
+    rng = np.random.default_rng(args.seed + run_id)
+    reset_state(args.redis_latency_ms / 1000, args.l1_size)
+
+    n_cars = args.requests * (args.batch_size if path == "batch" else 1)
+    cars = sample_cars(distribution, n_cars, args.catalog_size, args.zipf_s, rng, run_id)
+    if path == "batch":
+        payloads = [cars[i:i + args.batch_size] for i in range(0, n_cars, args.batch_size)]
+        url = "/predict/batch"
+    else:
+        payloads = cars
+        url = "/predict"
+
+    # Préchauffage : remplir le cache pour all-hit, sinon quelques requêtes hors catalogue
+    if distribution == "all-hit":
+        for car in make_catalog(args.catalog_size):
+            await client.post("/predict", json=car)
+    else:
+        for car in make_catalog(5, offset=99_000_000 + run_id * 100):
+            await client.post("/predict", json=car)
+
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def send(payload):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(url, json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(payload) for payload in payloads))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "path": path,
+        "distribution": distribution,
+        "requests": len(payloads),
+        "cars": n_cars,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(payloads) / elapsed,
+        "throughput_cars_per_s": n_cars / elapsed,
+        **percentiles(latencies)
+    }
+
+
+async def run_all(args) -> list:
+    main_module.prediction_log_writer.start()
+    transport = httpx.ASGITransport(app=main_module.app)
+    results = []
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            run_id = 0
+            for path in args.paths:
+                for distribution in args.distributions:
+                    result = await run_scenario(client, path, distribution, args, run_id)
+                    results.append(result)
+                    run_id += 1
+                    print(f"{path:>8} | {distribution:<8} | {result['throughput_rps']:>9.1f} req/s"
+                          f" | {result['throughput_cars_per_s']:>9.1f} voitures/s"
+                          f" | p50 {result['p50_ms']:>7.2f} ms | p95 {result['p95_ms']:>7.2f} ms"
+                          f" | p99 {result['p99_ms']:>7.2f} ms | erreurs {result['errors']}")
+    finally:
+        await main_module.prediction_log_writer.stop()
+    return results
+
+
+def compare(results: list, baseline_path: str):
+    """Afficher l'évolution par rapport à un résultat précédent"""
+    with open(baseline_path) as f:
+        baseline = {(r["path"], r["distribution"]): r for r in json.load(f)["results"]}
+    print(f"\n📊 Comparaison avec {baseline_path}")
+    for result in results:
+        previous = baseline.get((result["path"], result["distribution"]))
+        if previous is None:
+            continue
+        throughput = (result["throughput_rps"] / previous["throughput_rps"] - 1) * 100
+        p99 = (result["p99_ms"] / previous["p99_ms"] - 1) * 100
+        print(f"{result['path']:>8} | {result['distribution']:<8} | débit {throughput:+6.1f}% | p99 {p99:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de charge de l'API CarPriceML")
+    parser.add_argument("--requests", type=int, default=1000, help="Requêtes par scénario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requêtes simultanées")
+    parser.add_argument("--distributions", nargs="+", choices=DISTRIBUTIONS, default=DISTRIBUTIONS)
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=PATHS)
+    parser.add_argument("--batch-size", type=int, default=50, help="Voitures par requête /predict/batch")
+    parser.add_argument("--catalog-size", type=int, default=500, help="Voitures distinctes (all-hit, zipf)")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Exposant de la loi de Zipf")
+    parser.add_argument("--redis-latency-ms", type=float, default=0.0, help="Latence simulée par aller-retour Redis")
+    parser.add_argument("--l1-size", type=int, default=main_module.L1_CACHE_SIZE, help="Taille du cache L1 (0 = désactivé)")
+    parser.add_argument("--micro-batch-ms", type=float, default=main_module.MICRO_BATCH_WINDOW_MS,
+                        help="Fenêtre de micro-batching de /predict en ms (0 = désactivé)")
+    parser.add_argument("--micro-batch-size", type=int, default=main_module.MICRO_BATCH_MAX_SIZE,
+                        help="Taille maximale d'un micro-lot")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Fichier JSON de résultats (défaut : benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Fichier JSON d'un run précédent à comparer")
+    args = parser.parse_args()
+
+    if not main_module.serving_model.available:
+        sys.exit("❌ Modèle indisponible (vérifiez MODEL_PATH / FEATURE_INFO_PATH)")
+
+    main_module.micro_batcher = None
+    if args.micro_batch_ms > 0:
+        main_module.micro_batcher = main_module.MicroBatcher(args.micro_batch_ms / 1000, args.micro_batch_size)
+
+    # Les logs par requête fausseraient les mesures
+    logging.getLogger(main_module.__name__).setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    print("\n" + "=" * 70)
+    print(f"⏱️  BENCHMARK API - {args.requests} requêtes/scénario, concurrence {args.concurrency}")
+    print("=" * 70)
+
+    rss_before = rss_mb()
+    results = asyncio.run(run_all(args))
+
+    # Avant la sauvegarde : --output peut écraser le fichier de référence
+    if args.compare:
+        compare(results, args.compare)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "rss_mb": {"before": rss_before, "after": rss_mb()},
+        "results": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Résultats sauvegardés dans : {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark : construction d'un DataFrame par requête vs adaptateur NumPy
+
+Usage (depuis la racine du projet, avec les variables d'environnement de l'API) :
+    python benchmarks/bench_input_adapter.py --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.main import CarFeatures, build_features, build_feature_matrix, serving_model
+
+
+def time_call(fn, repeat: int) -> float:
+    """Durée moyenne d'un appel en microsecondes"""
+    fn()  # échauffement
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DataFrame vs NumPy pour l'entrée du modèle")
+    parser.add_argument("--repeat", type=int, default=200, help="Nombre d'appels par mesure")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100],
+                        help="Tailles de lot à mesurer")
+    args = parser.parse_args()
+
+    model = serving_model.get_model()
+    model_adapter = serving_model.adapter
+    if model is None or model_adapter is None:
+        sys.exit("❌ Modèle ou adaptateur NumPy indisponible (vérifiez MODEL_PATH / FEATURE_INFO_PATH)")
+
+    rng = np.random.default_rng(42)
+    print("\n" + "=" * 70)
+    print("⏱️  BENCHMARK ENTRÉE DU MODÈLE - DataFrame vs NumPy")
+    print("=" * 70)
+    print(f"{'lot':>6} | {'étape':<22} | {'DataFrame (µs)':>15} | {'NumPy (µs)':>12} | {'gain':>6}")
+
+    for size in args.batch_sizes:
+        cars = [
+            CarFeatures(year=int(y), max_power_bhp=int(p), torque_nm=int(t), engine_cc=int(c))
+            for y, p, t, c in zip(rng.integers(1990, 2026, size), rng.integers(40, 200, size),
+                                  rng.integers(80, 400, size), rng.integers(800, 3000, size))
+        ]
+        columns = model_adapter.columns
+        repeat = max(10, args.repeat // size)
+
+        build_df = time_call(lambda: build_features(cars), repeat)
+        build_np = time_call(lambda: build_feature_matrix(cars, columns), repeat)
+        full_df = time_call(lambda: model.predict(build_features(cars)), repeat)
+        full_np = time_call(lambda: model_adapter.predict(build_feature_matrix(cars, columns)), repeat)
+
+        print(f"{size:>6} | {'construction entrée':<22} | {build_df:>15.1f} | {build_np:>12.1f} | {build_df / build_np:>5.1f}x")
+        print(f"{size:>6} | {'entrée + predict':<22} | {full_df:>15.1f} | {full_np:>12.1f} | {full_df / full_np:>5.1f}x")
+
+    print("\n✅ Benchmark terminé")
+
+
+if __name__ == "__main__":
+    main()
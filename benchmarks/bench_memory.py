@@ -0,0 +1,135 @@
+"""
+Benchmark mémoire : N workers chargeant chacun le modèle vs modèle préchargé partagé
+
+Compare la mémoire par worker selon deux modes :
+- independent : chaque worker démarre un interpréteur neuf et importe l'API (et le modèle)
+                lui-même, comme uvicorn --workers N ou gunicorn sans preload_app
+- preload     : le processus parent importe l'API une fois, gèle ses objets (gc.freeze)
+                puis crée les workers par fork, comme app/gunicorn_conf.py
+
+Chaque worker exécute des prédictions avant la mesure, pour que les pages touchées à
+l'inférence soient comptées. RSS compte les pages partagées dans chaque processus ;
+PSS les répartit entre les processus qui les partagent ; USS ne compte que les pages
+propres au processus. La somme des PSS donne l'empreinte réelle de l'ensemble.
+
+Usage (Linux, depuis la racine du projet, avec les variables d'environnement de l'API) :
+    python benchmarks/bench_memory.py --workers 4
+"""
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import os
+import sys
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+MODES = ["independent", "preload"]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def memory_usage(pid: int) -> dict:
+    """RSS / PSS / USS d'un processus en Mo (d'après /proc/<pid>/smaps_rollup)"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "rss_mb": fields.get("Rss", 0) / 1024,
+        "pss_mb": fields.get("Pss", 0) / 1024,
+        "uss_mb": uss / 1024
+    }
+
+
+def sample_cars(n: int) -> list:
+    from app.main import CarFeatures
+    return [
+        CarFeatures(year=1995 + i % 30, max_power_bhp=50 + i % 150,
+                    torque_nm=100 + i % 300, engine_cc=800 + i % 2000)
+        for i in range(n)
+    ]
+
+
+def worker(ready, done, rows: int):
+    """Prédire, signaler au parent que la mesure peut avoir lieu, puis attendre"""
+    import app.main as main_module
+    cars = sample_cars(rows)
+    main_module.predict_cars(cars)
+    main_module.predict_cars(cars[:1])
+    ready.set()
+    done.wait()
+
+
+def run_mode(mode: str, n_workers: int, rows: int) -> dict:
+    """Lancer n_workers selon le mode, mesurer chacun, puis les arrêter"""
+    if mode == "preload":
+        import app.main  # noqa: F401 - chargement du modèle dans le parent
+        gc.freeze()
+        ctx = mp.get_context("fork")
+    else:
+        ctx = mp.get_context("spawn")
+
+    done = ctx.Event()
+    processes, events = [], []
+    for _ in range(n_workers):
+        ready = ctx.Event()
+        p = ctx.Process(target=worker, args=(ready, done, rows))
+        p.start()
+        processes.append(p)
+        events.append(ready)
+    for ready in events:
+        ready.wait()
+
+    workers = [memory_usage(p.pid) for p in processes]
+    done.set()
+    for p in processes:
+        p.join()
+
+    total = {key: sum(w[key] for w in workers) for key in workers[0]}
+    result = {"mode": mode, "workers": workers, "total": total}
+    if mode == "preload":
+        result["parent"] = memory_usage(os.getpid())
+        for key in total:
+            total[key] += result["parent"][key]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mémoire par worker : chargement indépendant vs préchargé")
+    parser.add_argument("--workers", type=int, default=4, help="Nombre de workers")
+    parser.add_argument("--rows", type=int, default=256, help="Voitures prédites par worker avant mesure")
+    parser.add_argument("--output", help="Fichier JSON de résultats (défaut : benchmarks/results/memory.json)")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("❌ /proc/<pid>/smaps_rollup indisponible (Linux requis)")
+
+    print("\n" + "=" * 70)
+    print(f"🧠 BENCHMARK MÉMOIRE - {args.workers} workers")
+    print("=" * 70)
+
+    # independent d'abord : le parent n'a pas encore importé l'API
+    results = [run_mode(mode, args.workers, args.rows) for mode in MODES]
+
+    print(f"\n{'Mode':<13}{'RSS/worker':>12}{'PSS/worker':>12}{'USS/worker':>12}{'PSS total':>12}")
+    for result in results:
+        n = len(result["workers"])
+        mean = {key: sum(w[key] for w in result["workers"]) / n for key in result["total"]}
+        print(f"{result['mode']:<13}{mean['rss_mb']:>10.1f}Mo{mean['pss_mb']:>10.1f}Mo"
+              f"{mean['uss_mb']:>10.1f}Mo{result['total']['pss_mb']:>10.1f}Mo")
+    print("\n(PSS total du mode preload : parent compris)")
+
+    output = args.output or os.path.join(RESULTS_DIR, "memory.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "config": vars(args), "results": results}, f, indent=2)
+    print(f"\n💾 Résultats sauvegardés dans : {output}")
+
+
+if __name__ == "__main__":
+    main()
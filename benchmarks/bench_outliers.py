@@ -0,0 +1,110 @@
+"""
+Benchmark : suppression des outliers (IQR) colonne par colonne vs masque combiné en une passe
+
+Compare, sur un DataFrame synthétique de plusieurs millions de lignes :
+- legacy     : implémentation historique (quartiles recalculés et DataFrame recopié à chaque colonne)
+- sequential : `remove_outliers(sequential=True)`, mêmes lignes que legacy, sans recopie
+- vectorized : `remove_outliers()`, bornes en un seul `quantile` puis un seul masque
+- streaming  : `approximate_iqr_bounds` par blocs (hors mémoire) puis `filter_outliers`
+
+Usage (depuis la racine du projet) :
+    python benchmarks/bench_outliers.py --rows 5000000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pipeline.train import OUTLIER_COLS, approximate_iqr_bounds, filter_outliers, remove_outliers
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def legacy_remove_outliers(df: pd.DataFrame, cols) -> pd.DataFrame:
+    """Implémentation historique de `remove_outliers` (référence)"""
+    for col in [c for c in cols if c in df.columns]:
+        Q1, Q3 = df[col].quantile([0.25, 0.75])
+        IQR = Q3 - Q1
+        df = df[(df[col] >= Q1 - 1.5 * IQR) & (df[col] <= Q3 + 1.5 * IQR)]
+    return df
+
+
+def synthetic_listings(n: int, seed: int = 42) -> pd.DataFrame:
+    """Annonces synthétiques à queues lourdes (prix log-normal, puissance et couple en loi de Student)"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'selling_price': rng.lognormal(13, 0.8, n),
+        'year': rng.integers(1990, 2025, n).astype(np.int16),
+        'max_power_bhp': (rng.standard_t(3, n) * 20 + 90).astype(np.float32),
+        'torque_nm': (rng.standard_t(3, n) * 40 + 200).astype(np.float32),
+        'engine_cc': rng.integers(800, 2500, n).astype(np.float32),
+    })
+
+
+def timed(fn, repeat: int):
+    """(durée médiane en s, dernier résultat) de `fn` sur `repeat` appels, sorties console masquées"""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start)
+    return float(np.median(timings)), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la suppression des outliers (IQR)")
+    parser.add_argument("--rows", type=int, default=5_000_000, help="Lignes du DataFrame synthétique")
+    parser.add_argument("--chunk-size", type=int, default=500_000, help="Lignes par bloc (variante streaming)")
+    parser.add_argument("--repeat", type=int, default=3, help="Mesures par variante (médiane)")
+    parser.add_argument("--output", help="Fichier JSON de résultats (défaut : benchmarks/results/outliers.json)")
+    args = parser.parse_args()
+
+    df = synthetic_listings(args.rows)
+    def chunks():
+        return (df.iloc[i:i + args.chunk_size] for i in range(0, len(df), args.chunk_size))
+
+    def streaming():
+        bounds = approximate_iqr_bounds(chunks, OUTLIER_COLS)
+        return pd.concat(filter_outliers(chunk, bounds) for chunk in chunks())
+
+    variants = {
+        "legacy": lambda: legacy_remove_outliers(df, OUTLIER_COLS),
+        "sequential": lambda: remove_outliers(df, OUTLIER_COLS, sequential=True),
+        "vectorized": lambda: remove_outliers(df, OUTLIER_COLS),
+        "streaming": streaming,
+    }
+
+    print("\n" + "=" * 70)
+    print(f"🧹 BENCHMARK OUTLIERS (IQR) - {args.rows:,} lignes, {len(OUTLIER_COLS)} colonnes")
+    print("=" * 70)
+    print(f"{'variante':<12} | {'durée (s)':>10} | {'lignes gardées':>15} | {'gain':>6}")
+
+    results = []
+    for name, fn in variants.items():
+        seconds, kept = timed(fn, args.repeat)
+        results.append({"variant": name, "seconds": seconds, "rows_kept": len(kept)})
+    reference = results[0]["seconds"]
+    for result in results:
+        result["speedup"] = reference / result["seconds"]
+        print(f"{result['variant']:<12} | {result['seconds']:>10.3f} | {result['rows_kept']:>15,} | "
+              f"{result['speedup']:>5.1f}x")
+
+    output = args.output or os.path.join(RESULTS_DIR, "outliers.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "config": vars(args), "results": results}, f, indent=2)
+    print(f"\n💾 Résultats sauvegardés dans : {output}")
+
+
+if __name__ == "__main__":
+    main()
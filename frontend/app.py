@@ -3,6 +3,10 @@ import requests
 import os
 import json
 import pandas as pd
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pipeline.features import CURRENT_YEAR, vehicle_age as compute_vehicle_age  # noqa: E402
 
 # Configuration de la page
 st.set_page_config(
@@ -65,7 +69,7 @@ with col1:
     year = st.slider(
         "📅 Année de fabrication",
         min_value=1990,
-        max_value=2025,
+        max_value=CURRENT_YEAR,
         value=2015,
         help="Année de mise en circulation du véhicule"
     )
@@ -99,7 +103,7 @@ with col_info1:
     st.metric("Puissance maximale ", max_power_bhp)
 
 with col_info2:
-    vehicle_age = 2025 - year
+    vehicle_age = compute_vehicle_age(year)
     st.metric("Âge du véhicule", f"{vehicle_age} ans")
 
 with col_info3:
@@ -0,0 +1,119 @@
+"""
+Chargement des annonces par blocs (CSV ou Parquet), pour l'entraînement et l'analyse exploratoire
+
+Le fichier n'est jamais lu d'un bloc : chaque bloc est typé (entiers et flottants réduits,
+chaînes en catégories), nettoyé puis dédoublonné par empreinte de ligne avant d'être
+conservé. Seul le résultat nettoyé doit tenir en mémoire, pas le fichier brut.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import resource
+except ImportError:  # Windows : pas de mesure du pic mémoire
+    resource = None
+
+CHUNK_SIZE = 200_000
+
+# Types explicites des colonnes connues ; les autres colonnes numériques sont réduites
+# au plus petit type adapté et les chaînes converties en catégories.
+COLUMN_DTYPES = {
+    "year": "int16",
+    "km_driven": "int32",
+    "selling_price": "float64",
+    "max_power_bhp": "float32",
+    "torque_nm": "float32",
+    "engine_cc": "float32",
+}
+
+
+def read_chunks(filepath: str, chunk_size: int = CHUNK_SIZE):
+    """Lire un CSV ou un Parquet par blocs de `chunk_size` lignes"""
+    if filepath.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        float_dtypes = {col: dtype for col, dtype in COLUMN_DTYPES.items() if dtype.startswith("float")}
+        yield from pd.read_csv(filepath, chunksize=chunk_size, dtype=float_dtypes)
+
+
+def apply_dtypes(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Typer un bloc : types explicites, entiers/flottants réduits, chaînes en catégories
+
+    Une colonne entière contenant des valeurs manquantes reste flottante (float32).
+    """
+    for col in chunk.columns:
+        dtype = COLUMN_DTYPES.get(col)
+        series = chunk[col]
+        if dtype is not None:
+            if dtype.startswith("int") and series.isna().any():
+                dtype = "float32"
+            chunk[col] = series.astype(dtype)
+        elif series.dtype == object:
+            chunk[col] = series.astype("category")
+        elif pd.api.types.is_integer_dtype(series):
+            chunk[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            chunk[col] = pd.to_numeric(series, downcast="float")
+    return chunk
+
+
+def concat_chunks(chunks: list) -> pd.DataFrame:
+    """Concaténer des blocs en gardant les colonnes catégorielles (catégories réunies)"""
+    if not chunks:
+        return pd.DataFrame()
+    categorical = [col for col, dtype in chunks[0].dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    for col in categorical:
+        categories = union_categoricals([chunk[col] for chunk in chunks], ignore_order=True).categories
+        for chunk in chunks:
+            chunk[col] = chunk[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def peak_memory_mb() -> float:
+    """Pic de mémoire résidente du processus en Mo (None si indisponible)"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def read_listings(filepath: str, chunk_size: int = CHUNK_SIZE, drop_duplicates: bool = True,
+                  dropna: bool = True) -> pd.DataFrame:
+    """Charger les annonces par blocs, avec dédoublonnage entre blocs et typage explicite
+
+    Les doublons sont repérés par l'empreinte 64 bits de chaque ligne
+    (`pd.util.hash_pandas_object`) : seules les empreintes déjà vues sont gardées en
+    mémoire, triées, pour tester les blocs suivants.
+    """
+    chunks = []
+    seen = np.empty(0, dtype=np.uint64)
+    rows_read = 0
+    for chunk in read_chunks(filepath, chunk_size):
+        rows_read += len(chunk)
+        if dropna:
+            chunk = chunk.dropna()
+        chunk = apply_dtypes(chunk)
+        if drop_duplicates and len(chunk):
+            hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+            _, first = np.unique(hashes, return_index=True)
+            keep = np.zeros(len(chunk), dtype=bool)
+            keep[first] = True
+            keep &= ~np.isin(hashes, seen, assume_unique=False)
+            chunk = chunk[keep]
+            seen = np.union1d(seen, hashes[keep])
+        chunks.append(chunk.reset_index(drop=True))
+
+    df = concat_chunks(chunks)
+    df.attrs["rows_read"] = rows_read
+    return df
+
+
+def memory_report(df: pd.DataFrame) -> str:
+    """Résumé mémoire : taille du DataFrame et pic du processus"""
+    report = f"DataFrame {df.memory_usage(deep=True).sum() / 1e6:.1f} Mo"
+    peak = peak_memory_mb()
+    if peak is not None:
+        report += f", pic du processus {peak:.0f} Mo"
+    return report
@@ -1,134 +1,289 @@
+"""
+Analyse exploratoire des annonces, incrémentale
+
+Les statistiques (describe, doublons, outliers IQR, corrélations...) sont calculées une
+seule fois par jeu de données et mises en cache par empreinte du fichier. Chaque
+graphique est identifié par l'empreinte de ses propres données : seuls ceux dont les
+données ont changé sont redessinés, en parallèle dans des processus workers.
+
+Usage (depuis pipeline/) :
+    python explore.py --workers 4
+"""
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+import argparse
+import io
+import json
+import joblib
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pipeline.data import memory_report, read_listings  # noqa: E402
+from pipeline.train import DATASET_CACHE_DIR, file_sha256  # noqa: E402
 
 # Configuration
 plt.style.use('seaborn-v0_8-darkgrid')
 sns.set_palette("husl")
+DATA_PATH = '../data/car-details.csv'
 OUTPUT_DIR = 'visualizations'
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+EDA_CACHE_VERSION = 1  # à incrémenter si le calcul des statistiques change
+CHARTS_MANIFEST = '.eda-charts.json'  # empreinte des données de chaque graphique enregistré
 
-def load_data(filepath='../data/car-details.csv'):
-    """Charger les données"""
-    df = pd.read_csv(filepath)
+def load_data(filepath=DATA_PATH):
+    """Charger les données brutes par blocs (doublons et valeurs manquantes conservés pour l'analyse)"""
+    df = read_listings(filepath, drop_duplicates=False, dropna=False)
     print(f"\n✅ Données chargées : {df.shape[0]} lignes, {df.shape[1]} colonnes")
+    print(f"🧠 Mémoire : {memory_report(df)}")
     print(f"Colonnes : {', '.join(df.columns)}\n")
     return df
 
-def show_basic_info(df):
+def compute_statistics(df):
+    """Toutes les statistiques de l'analyse, calculées une seule fois
+
+    Les quartiles des outliers sont ceux de `describe`, et la matrice de corrélation
+    sert à la fois au résumé et à la heatmap.
+    """
+    numeric = df.select_dtypes(include=np.number)
+    describe = numeric.describe() if len(numeric.columns) else df.describe()
+    if len(numeric.columns):
+        q1, q3 = describe.loc['25%'], describe.loc['75%']
+        iqr = q3 - q1
+        outliers = ((numeric < q1 - 1.5 * iqr) | (numeric > q3 + 1.5 * iqr)).sum()
+    else:
+        outliers = pd.Series(dtype='int64')
+
+    info = io.StringIO()
+    df.info(buf=info)
+    missing = df.isnull().sum()
+
+    categories = {}
+    for col in df.select_dtypes(include=['object', 'category']):
+        counts = df[col].value_counts()
+        categories[col] = counts[counts > 0]
+
+    return {
+        'rows': len(df),
+        'info': info.getvalue(),
+        'missing': missing[missing > 0],
+        'duplicates': int(df.duplicated().sum()),
+        'describe': describe,
+        'categories': categories,
+        'outliers': outliers,
+        'corr': numeric.corr()
+    }
+
+def show_basic_info(stats):
     """Afficher les infos générales et statistiques"""
     print("=== INFORMATIONS GÉNÉRALES ===")
-    print(df.info())
+    print(stats['info'])
     print("\n=== VALEURS MANQUANTES ===")
-    missing = df.isnull().sum()
-    missing = missing[missing > 0]
-    if missing.empty:
+    if stats['missing'].empty:
         print("Aucune valeur manquante")
     else:
-        print(missing)
-    print(f"\nDoublons : {df.duplicated().sum()}")
+        print(stats['missing'])
+    print(f"\nDoublons : {stats['duplicates']}")
 
     print("\n=== STATISTIQUES NUMÉRIQUES ===")
-    print(df.describe())
+    print(stats['describe'])
 
-def analyze_categories(df):
+def analyze_categories(stats):
     """Afficher les distributions des variables catégorielles"""
     print("\n=== VARIABLES CATÉGORIELLES ===")
-    for col in df.select_dtypes(include='object'):
-        print(f"\n{col} : {df[col].nunique()} valeurs uniques")
-        print(df[col].value_counts().head(5))
+    for col, counts in stats['categories'].items():
+        print(f"\n{col} : {len(counts)} valeurs uniques")
+        print(counts.head(5))
 
-def detect_outliers(df):
+def detect_outliers(stats):
     """Détection simple des outliers par IQR"""
     print("\n=== OUTLIERS (IQR) ===")
-    for col in df.select_dtypes(include=np.number):
-        Q1, Q3 = df[col].quantile([0.25, 0.75])
-        IQR = Q3 - Q1
-        lower, upper = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
-        n_out = ((df[col] < lower) | (df[col] > upper)).sum()
+    for col, n_out in stats['outliers'].items():
         if n_out > 0:
-            print(f"{col}: {n_out} ({n_out/len(df)*100:.2f}%)")
+            print(f"{col}: {n_out} ({n_out/stats['rows']*100:.2f}%)")
     print("")
 
-def correlation_summary(df, target='selling_price'):
+def correlation_summary(stats, target='selling_price'):
     """Affiche les corrélations avec la variable cible"""
-    num_cols = df.select_dtypes(include=np.number)
-    if target not in num_cols: return
-    corr = num_cols.corr()[target].sort_values(ascending=False)
+    if target not in stats['corr']: return
     print("\n=== CORRÉLATIONS AVEC LE PRIX ===")
-    print(corr)
+    print(stats['corr'][target].sort_values(ascending=False))
 
-def save_plot(fig, name):
+def save_plot(fig, name, output_dir=OUTPUT_DIR):
     fig.tight_layout()
-    fig.savefig(f"{OUTPUT_DIR}/{name}.png", dpi=150, bbox_inches='tight')
+    fig.savefig(f"{output_dir}/{name}.png", dpi=150, bbox_inches='tight')
     plt.close(fig)
-    print(f"✅ {name}.png")
 
-def create_visuals(df):
-    """Création rapide des graphiques principaux"""
-    print("\n=== VISUALISATIONS ===")
+def plot_price_distribution(price):
+    fig, ax = plt.subplots(1, 2, figsize=(12, 5))
+    sns.histplot(price, bins=40, kde=True, ax=ax[0], color='skyblue')
+    sns.boxplot(y=price, ax=ax[1], color='coral')
+    ax[0].set_title('Distribution du prix'); ax[1].set_title('Boxplot du prix')
+    return fig
+
+def plot_price_by_company(data):
+    prices, top = data
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(x='selling_price', y='company', data=prices, estimator=np.mean, order=top, ax=ax)
+    ax.set_title('Prix moyen par marque (Top 10)')
+    return fig
+
+def plot_price_vs_kms(data):
+    fig, ax = plt.subplots(figsize=(8, 5))
+    sns.scatterplot(x='km_driven', y='selling_price', data=data, alpha=0.6)
+    ax.set_title('Prix vs Kilométrage')
+    return fig
+
+def plot_price_by_year(yearly):
+    fig, ax = plt.subplots(figsize=(8, 5))
+    sns.lineplot(x=yearly.index, y=yearly.values, marker='o', ax=ax)
+    ax.set_title('Évolution du prix moyen par année')
+    return fig
+
+def plot_fuel_distribution(counts):
+    fig, ax = plt.subplots(figsize=(6, 6))
+    counts.plot.pie(autopct='%1.1f%%', ax=ax, cmap='Set2')
+    ax.set_ylabel('')
+    ax.set_title('Répartition du type de carburant')
+    return fig
+
+def plot_correlation_heatmap(corr):
+    fig, ax = plt.subplots(figsize=(10, 8))
+    sns.heatmap(corr, annot=True, fmt='.2f', cmap='coolwarm', ax=ax)
+    ax.set_title('Matrice de corrélation')
+    return fig
 
+# Graphiques : nom du fichier -> fonction de tracé (appelée avec les données de `chart_inputs`)
+CHARTS = {
+    '01_price_distribution': plot_price_distribution,
+    '02_price_by_company': plot_price_by_company,
+    '03_price_vs_kms': plot_price_vs_kms,
+    '04_price_by_year': plot_price_by_year,
+    '05_fuel_type_distribution': plot_fuel_distribution,
+    '06_correlation_heatmap': plot_correlation_heatmap,
+}
+
+def chart_inputs(df, stats):
+    """Données de chaque graphique : uniquement les colonnes ou agrégats qu'il affiche"""
+    inputs = {}
     if 'selling_price' in df:
-        # 1. Distribution du prix
-        fig, ax = plt.subplots(1, 2, figsize=(12, 5))
-        sns.histplot(df['selling_price'], bins=40, kde=True, ax=ax[0], color='skyblue')
-        sns.boxplot(y=df['selling_price'], ax=ax[1], color='coral')
-        ax[0].set_title('Distribution du prix'); ax[1].set_title('Boxplot du prix')
-        save_plot(fig, '01_price_distribution')
-
-    # 2. Prix moyen par marque
+        inputs['01_price_distribution'] = df['selling_price']
     if {'company', 'selling_price'}.issubset(df.columns):
-        fig, ax = plt.subplots(figsize=(10, 6))
-        top = df['company'].value_counts().head(10).index
-        sns.barplot(x='selling_price', y='company', data=df[df['company'].isin(top)],
-                    estimator=np.mean, order=top, ax=ax)
-        ax.set_title('Prix moyen par marque (Top 10)')
-        save_plot(fig, '02_price_by_company')
-
-    # 3. Prix vs Kilométrage
+        top = list(stats['categories']['company'].index[:10])
+        inputs['02_price_by_company'] = (df.loc[df['company'].isin(top), ['company', 'selling_price']], top)
     if {'km_driven', 'selling_price'}.issubset(df.columns):
-        fig, ax = plt.subplots(figsize=(8, 5))
-        sns.scatterplot(x='km_driven', y='selling_price', data=df, alpha=0.6)
-        ax.set_title('Prix vs Kilométrage')
-        save_plot(fig, '03_price_vs_kms')
-
-    # 4. Prix moyen par année
+        inputs['03_price_vs_kms'] = df[['km_driven', 'selling_price']]
     if {'year', 'selling_price'}.issubset(df.columns):
-        fig, ax = plt.subplots(figsize=(8, 5))
-        yearly = df.groupby('year')['selling_price'].mean()
-        sns.lineplot(x=yearly.index, y=yearly.values, marker='o', ax=ax)
-        ax.set_title('Évolution du prix moyen par année')
-        save_plot(fig, '04_price_by_year')
-
-    # 5. Répartition du carburant
-    if 'fuel' in df:
-        fig, ax = plt.subplots(figsize=(6, 6))
-        df['fuel'].value_counts().plot.pie(autopct='%1.1f%%', ax=ax, cmap='Set2')
-        ax.set_ylabel('')
-        ax.set_title('Répartition du type de carburant')
-        save_plot(fig, '05_fuel_type_distribution')
-
-    # 6. Heatmap de corrélation
-    num_cols = df.select_dtypes(include=np.number)
-    if len(num_cols.columns) > 1:
-        fig, ax = plt.subplots(figsize=(10, 8))
-        sns.heatmap(num_cols.corr(), annot=True, fmt='.2f', cmap='coolwarm', ax=ax)
-        ax.set_title('Matrice de corrélation')
-        save_plot(fig, '06_correlation_heatmap')
+        inputs['04_price_by_year'] = df.groupby('year')['selling_price'].mean()
+    if 'fuel' in stats['categories']:
+        inputs['05_fuel_type_distribution'] = stats['categories']['fuel']
+    if len(stats['corr'].columns) > 1:
+        inputs['06_correlation_heatmap'] = stats['corr']
+    return inputs
+
+def render_chart(name, data, output_dir=OUTPUT_DIR):
+    """Tracer et enregistrer un graphique (exécuté dans un processus worker)"""
+    save_plot(CHARTS[name](data), name, output_dir)
+    return name
+
+def eda_cache_key(filepath):
+    """Clé des statistiques : contenu du fichier et version du calcul"""
+    return f"{file_sha256(filepath)[:16]}-v{EDA_CACHE_VERSION}"
+
+def load_statistics(filepath, cache_dir=DATASET_CACHE_DIR, use_cache=True):
+    """Statistiques et empreintes des graphiques, relues depuis le cache si le fichier n'a pas changé
+
+    Renvoie aussi le DataFrame s'il a fallu le charger (None sinon).
+    """
+    cache_path = os.path.join(cache_dir, f"eda-{eda_cache_key(filepath)}.joblib")
+    if use_cache and os.path.exists(cache_path):
+        cached = joblib.load(cache_path)
+        print(f"♻️ Statistiques relues depuis le cache : {cache_path}")
+        return cached['stats'], cached['digests'], None
+
+    df = load_data(filepath)
+    stats = compute_statistics(df)
+    digests = {name: joblib.hash(data) for name, data in chart_inputs(df, stats).items()}
+    os.makedirs(cache_dir, exist_ok=True)
+    joblib.dump({'stats': stats, 'digests': digests}, f"{cache_path}.tmp")
+    os.replace(f"{cache_path}.tmp", cache_path)
+    print(f"💾 Statistiques mises en cache : {cache_path}")
+    return stats, digests, df
+
+def stale_charts(digests, output_dir=OUTPUT_DIR):
+    """Graphiques à redessiner : données changées depuis le dernier rendu, ou fichier absent"""
+    manifest_path = os.path.join(output_dir, CHARTS_MANIFEST)
+    rendered = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            rendered = json.load(f)
+    return [name for name, digest in digests.items()
+            if rendered.get(name) != digest or not os.path.exists(f"{output_dir}/{name}.png")]
+
+def create_visuals(inputs, names, output_dir=OUTPUT_DIR, workers=None):
+    """Dessiner les graphiques `names`, répartis sur `workers` processus"""
+    print("\n=== VISUALISATIONS ===")
+    workers = min(workers or os.cpu_count(), len(names))
+    if workers <= 1:
+        for name in names:
+            print(f"✅ {render_chart(name, inputs[name], output_dir)}.png")
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_chart, name, inputs[name], output_dir) for name in names]
+        for future in futures:
+            print(f"✅ {future.result()}.png")
+
+def save_manifest(digests, names, output_dir=OUTPUT_DIR):
+    """Enregistrer l'empreinte des données des graphiques redessinés"""
+    manifest_path = os.path.join(output_dir, CHARTS_MANIFEST)
+    rendered = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            rendered = json.load(f)
+    rendered.update({name: digests[name] for name in names})
+    with open(manifest_path, 'w') as f:
+        json.dump(rendered, f, indent=2, sort_keys=True)
+
+def run_analysis(filepath=DATA_PATH, output_dir=OUTPUT_DIR, cache_dir=DATASET_CACHE_DIR,
+                 workers=None, use_cache=True):
+    """Afficher le rapport et mettre à jour les graphiques ; renvoie les graphiques redessinés
+
+    Le fichier n'est chargé que si ses statistiques ne sont pas en cache ou si un
+    graphique doit être redessiné.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stats, digests, df = load_statistics(filepath, cache_dir, use_cache)
+
+    show_basic_info(stats)
+    analyze_categories(stats)
+    detect_outliers(stats)
+    correlation_summary(stats)
+
+    names = list(digests) if not use_cache else stale_charts(digests, output_dir)
+    if not names:
+        print("\n♻️ Graphiques à jour, aucun à redessiner")
+        return []
+    if df is None:
+        df = load_data(filepath)
+    create_visuals(chart_inputs(df, stats), names, output_dir, workers)
+    save_manifest(digests, names, output_dir)
+    return names
 
 def main():
+    parser = argparse.ArgumentParser(description="Analyse exploratoire CarPriceML")
+    parser.add_argument("--data", default=DATA_PATH, help="Annonces (.csv ou .parquet)")
+    parser.add_argument("--workers", type=int, help="Processus de rendu des graphiques (défaut : nombre de cœurs)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Recalculer les statistiques et redessiner tous les graphiques")
+    args = parser.parse_args()
+
     print("\n" + "="*60)
     print("🚗 ANALYSE EXPLORATOIRE - CarPriceML")
     print("="*60)
 
-    df = load_data()
-    show_basic_info(df)
-    analyze_categories(df)
-    detect_outliers(df)
-    correlation_summary(df)
-    create_visuals(df)
+    run_analysis(args.data, workers=args.workers, use_cache=not args.no_cache)
 
     print("\n✅ ANALYSE TERMINÉE")
     print(f"📁 Visualisations enregistrées dans '{OUTPUT_DIR}/'\n")
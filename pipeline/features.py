@@ -0,0 +1,48 @@
+"""
+Features du modèle : source unique pour l'entraînement, l'API, le scoring hors ligne et le frontend
+
+Les transformations opèrent sur des tableaux NumPy (une valeur par voiture) : un lot
+entier est transformé en une seule opération vectorisée, qu'il vienne d'un DataFrame
+d'entraînement, d'un bloc de catalogue ou d'une liste de requêtes de l'API.
+"""
+import numpy as np
+import pandas as pd
+
+CURRENT_YEAR = 2025  # année de référence de l'âge du véhicule
+INPUT_FEATURES = ["year", "max_power_bhp", "torque_nm", "engine_cc"]  # saisies (entrées de l'API)
+MODEL_FEATURES = ["vehicle_age"] + INPUT_FEATURES  # colonnes vues par le modèle
+
+
+def vehicle_age(year):
+    """Âge du véhicule en années (scalaire ou tableau)"""
+    return CURRENT_YEAR - year
+
+
+# Features dérivées : nom -> fonction des tableaux d'entrée
+DERIVED_FEATURES = {
+    "vehicle_age": lambda inputs: vehicle_age(inputs["year"]),
+}
+
+
+def add_derived_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Ajouter au DataFrame les features dérivées calculables depuis ses colonnes"""
+    if "year" in df.columns:
+        df["vehicle_age"] = vehicle_age(df["year"])
+    return df
+
+
+def feature_matrix(inputs: dict, columns: list) -> np.ndarray:
+    """Matrice float64 (une ligne par voiture) dans l'ordre `columns`
+
+    `inputs` associe chaque feature saisie à un tableau de valeurs (même longueur).
+    """
+    n_rows = len(inputs[INPUT_FEATURES[0]])
+    X = np.empty((n_rows, len(columns)), dtype=np.float64)
+    for j, column in enumerate(columns):
+        X[:, j] = DERIVED_FEATURES[column](inputs) if column in DERIVED_FEATURES else inputs[column]
+    return X
+
+
+def feature_frame(inputs: dict) -> pd.DataFrame:
+    """DataFrame des colonnes du modèle (pipeline sklearn), depuis des tableaux d'entrée"""
+    return add_derived_features(pd.DataFrame({name: inputs[name] for name in INPUT_FEATURES}))[MODEL_FEATURES]
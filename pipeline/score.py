@@ -0,0 +1,162 @@
+"""
+Scoring hors ligne : re-prédire tout un catalogue (CSV/Parquet) avec le modèle sauvegardé
+
+Le fichier d'entrée est lu par blocs, les features dérivées sont créées comme à
+l'entraînement (pipeline/features.py), puis les blocs sont prédits en parallèle par un
+pool de processus (chaque worker charge le modèle une seule fois). Les prédictions
+sont écrites dans l'ordre de l'entrée, en Parquet (ou en CSV selon l'extension).
+
+Usage (depuis pipeline/) :
+    python score.py catalogue.csv catalogue_scored.parquet --workers 8
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pipeline.features import add_derived_features  # noqa: E402
+from pipeline.train import MODEL_DIR  # noqa: E402
+
+CHUNK_SIZE = 100_000
+PREDICTION_COLUMN = "predicted_price"
+
+# Modèle du processus worker (chargé une fois par `init_worker`)
+_model = None
+_feature_cols = None
+
+
+def init_worker(model_path: str, feature_cols: list):
+    """Charger le modèle dans le worker, forêt limitée à un thread (le parallélisme vient du pool)"""
+    global _model, _feature_cols
+    _model = joblib.load(model_path)
+    try:
+        _model.regressor_.named_steps["model"].set_params(n_jobs=1)
+    except (AttributeError, KeyError):
+        pass
+    _feature_cols = feature_cols
+
+
+def score_chunk(features: pd.DataFrame) -> np.ndarray:
+    """Prédire les prix (MAD) d'un bloc de features"""
+    return _model.predict(features[_feature_cols])
+
+
+def read_chunks(path: str, chunk_size: int):
+    """Lire un CSV ou un Parquet par blocs de `chunk_size` lignes"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Écrire les blocs prédits à la suite dans un Parquet (ou un CSV selon l'extension)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        self._first = True
+
+    def write(self, chunk: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def prepare_chunk(chunk: pd.DataFrame, feature_cols: list) -> pd.DataFrame:
+    """Créer les features dérivées d'un bloc et vérifier que le modèle y trouve ses colonnes"""
+    chunk = add_derived_features(chunk)
+    missing = [col for col in feature_cols if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans l'entrée : {', '.join(missing)}")
+    return chunk
+
+
+def score_file(input_path: str, output_path: str, model_path: str, feature_info_path: str,
+               workers: int = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Prédire tout le fichier d'entrée ; renvoie le nombre de lignes, la durée et le débit
+
+    Au plus 2 blocs par worker sont en cours à la fois : la mémoire reste bornée
+    quelle que soit la taille du fichier, et l'ordre des lignes est conservé.
+    """
+    feature_info = joblib.load(feature_info_path)
+    feature_cols = feature_info["num_cols"] + feature_info["cat_cols"]
+    workers = workers or os.cpu_count()
+
+    start = time.perf_counter()
+    rows = 0
+    writer = ChunkWriter(output_path)
+    pending = deque()
+
+    def write_next():
+        nonlocal rows
+        chunk, future = pending.popleft()
+        chunk[PREDICTION_COLUMN] = future.result()
+        writer.write(chunk)
+        rows += len(chunk)
+        print(f"   {rows:,} lignes prédites ({rows / (time.perf_counter() - start):,.0f} lignes/s)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(model_path, feature_cols)) as pool:
+            for chunk in read_chunks(input_path, chunk_size):
+                chunk = prepare_chunk(chunk, feature_cols)
+                pending.append((chunk, pool.submit(score_chunk, chunk[feature_cols])))
+                if len(pending) >= 2 * workers:
+                    write_next()
+            while pending:
+                write_next()
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds if seconds else 0.0,
+            "workers": workers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring hors ligne d'un catalogue CarPriceML")
+    parser.add_argument("input", help="Fichier d'entrée (.csv ou .parquet)")
+    parser.add_argument("output", help="Fichier de sortie (.parquet, ou .csv)")
+    parser.add_argument("--model", default=f"{MODEL_DIR}/rf_model.joblib", help="Modèle sauvegardé")
+    parser.add_argument("--feature-info", default=f"{MODEL_DIR}/feature_info.joblib",
+                        help="Colonnes du modèle (feature_info.joblib)")
+    parser.add_argument("--workers", type=int, help="Processus de scoring (défaut : nombre de cœurs)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Lignes par bloc")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print(f"🏷️ SCORING HORS LIGNE - {args.input}")
+    print("=" * 70)
+
+    stats = score_file(args.input, args.output, args.model, args.feature_info,
+                       workers=args.workers, chunk_size=args.chunk_size)
+
+    print(f"\n✅ {stats['rows']:,} lignes prédites en {stats['seconds']:.1f}s "
+          f"({stats['rows_per_second']:,.0f} lignes/s, {stats['workers']} workers)")
+    print(f"💾 Prédictions sauvegardées dans : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,31 +2,68 @@ import pandas as pd
 import numpy as np
 import joblib
 import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 - active HalvingRandomSearchCV
+from sklearn.model_selection import GridSearchCV, HalvingRandomSearchCV, RandomizedSearchCV, train_test_split
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer, TransformedTargetRegressor
 from sklearn.pipeline import Pipeline
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+import argparse
+import hashlib
+import io
+import itertools
+import json
 import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pipeline.data import memory_report, read_listings  # noqa: E402
+from pipeline.features import (  # noqa: E402
+    CURRENT_YEAR, INPUT_FEATURES, MODEL_FEATURES, add_derived_features, feature_frame
+)
 
 # Constantes 
 CONVERSION_RATE = 0.5  # roupie -> MAD
-CURRENT_YEAR = 2025
 OUTPUT_DIR = "visualizations"
+DATA_PATH = "../data/car-details.csv"
+DATASET_CACHE_DIR = "../data/cache"
+DATASET_PREPARATION_VERSION = 3  # à incrémenter quand la préparation change (invalide le cache)
+OUTLIER_COLS = ["selling_price", "year", "max_power_bhp", "torque_nm"]
 MODEL_DIR = "../models"
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(MODEL_DIR, exist_ok=True)
+BUNDLE_DIR = f"{MODEL_DIR}/rf_bundle"
+BUNDLE_FORMAT_VERSION = 1
+LOOKUP_DIR = f"{MODEL_DIR}/lookup"
+LOOKUP_FEATURES = INPUT_FEATURES  # entrées de l'API
+LOOKUP_MAX_CELLS = 50_000_000
+LOOKUP_CHUNK_SIZE = 100_000
+MODEL_PARAMS = {"n_estimators": 100, "max_depth": 15, "random_state": 42, "n_jobs": -1}
+SWEEP_SPACE = {
+    "n_estimators": [25, 50, 100, 200],
+    "max_depth": [8, 12, 15, None],
+    "max_leaf_nodes": [None, 256, 1024],
+}
+SWEEP_LATENCY_REPEAT = 50  # mesures de latence unitaire par configuration (médiane)
+SWEEP_BATCH_ROWS = 1000
+SEARCH_SPACE = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [10, 15, 20, None],
+    "min_samples_leaf": [1, 2, 5],
+    "max_features": [1.0, 0.6, "sqrt"],
+}
 
 
 # Fonctions principales
 
 def load_data(filepath: str) -> pd.DataFrame:
-    """Charger et nettoyer les données"""
+    """Charger et nettoyer les données (CSV ou Parquet, lus par blocs : pipeline/data.py)"""
     print("📥 Chargement des données...")
-    df = pd.read_csv(filepath).drop_duplicates().dropna()
-    print(f"✅ Données chargées : {df.shape[0]} lignes, {df.shape[1]} colonnes")
+    df = read_listings(filepath)
+    print(f"✅ Données chargées : {df.shape[0]} lignes, {df.shape[1]} colonnes "
+          f"({df.attrs['rows_read']} lues)")
+    print(f"🧠 Mémoire : {memory_report(df)}")
     return df
 
 
@@ -37,54 +74,208 @@ def convert_prices(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def remove_outliers(df: pd.DataFrame, cols=None) -> pd.DataFrame:
-    """Supprimer les outliers via IQR"""
+def remove_outliers(df: pd.DataFrame, cols=None, sequential: bool = False) -> pd.DataFrame:
+    """Supprimer les outliers via IQR (colonnes `cols`, par défaut toutes les colonnes numériques)
+
+    Les quartiles de toutes les colonnes sont calculés en un seul appel à `quantile`,
+    puis un masque combiné est appliqué une seule fois. Avec `sequential=True`, les
+    quartiles d'une colonne sont calculés sur les lignes retenues par les colonnes
+    précédentes (comportement historique), toujours sans recopier le DataFrame.
+    """
     print("\n🧹 Suppression des outliers...")
-    cols = cols
-    for col in [c for c in cols if c in df.columns]:
-        Q1, Q3 = df[col].quantile([0.25, 0.75])
-        IQR = Q3 - Q1
-        df = df[(df[col] >= Q1 - 1.5 * IQR) & (df[col] <= Q3 + 1.5 * IQR)]
+    if cols is None:
+        cols = df.select_dtypes(include="number").columns
+    cols = [c for c in cols if c in df.columns]
+
+    if sequential:
+        mask = pd.Series(True, index=df.index)
+        for col in cols:
+            Q1, Q3 = df[col][mask].quantile([0.25, 0.75])
+            IQR = Q3 - Q1
+            mask &= df[col].between(Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+        df = df[mask]
+    else:
+        quartiles = df[cols].quantile([0.25, 0.75])
+        IQR = quartiles.loc[0.75] - quartiles.loc[0.25]
+        lower, upper = quartiles.loc[0.25] - 1.5 * IQR, quartiles.loc[0.75] + 1.5 * IQR
+        df = filter_outliers(df, {col: (lower[col], upper[col]) for col in cols})
+
     print(f"✅ Après suppression des outliers : {df.shape[0]} lignes restantes")
     return df
 
 
+def approximate_iqr_bounds(make_chunks, cols, bins: int = 1 << 16) -> dict:
+    """Bornes IQR approchées de données lues par blocs (jeu plus grand que la mémoire)
+
+    Deux passes sur `make_chunks()` : minimum et maximum de chaque colonne, puis un
+    histogramme de `bins` classes ; les quartiles sont interpolés dans leur classe
+    (erreur au plus (max - min) / bins). Renvoie {colonne: (borne basse, borne haute)}.
+    """
+    lows = dict.fromkeys(cols, np.inf)
+    highs = dict.fromkeys(cols, -np.inf)
+    for chunk in make_chunks():
+        for col in cols:
+            values = chunk[col].to_numpy(dtype=np.float64)
+            values = values[~np.isnan(values)]
+            if len(values):
+                lows[col] = min(lows[col], values.min())
+                highs[col] = max(highs[col], values.max())
+
+    counts = {col: np.zeros(bins, dtype=np.int64) for col in cols}
+    for chunk in make_chunks():
+        for col in cols:
+            values = chunk[col].to_numpy(dtype=np.float64)
+            counts[col] += np.histogram(values[~np.isnan(values)], bins=bins, range=(lows[col], highs[col]))[0]
+
+    bounds = {}
+    for col in cols:
+        edges = np.linspace(lows[col], highs[col], bins + 1)
+        cumulative = np.cumsum(counts[col])
+        Q1, Q3 = (histogram_quantile(counts[col], cumulative, edges, q) for q in (0.25, 0.75))
+        IQR = Q3 - Q1
+        bounds[col] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+    return bounds
+
+
+def histogram_quantile(counts: np.ndarray, cumulative: np.ndarray, edges: np.ndarray, q: float) -> float:
+    """Quantile (interpolation linéaire, comme pandas) estimé depuis un histogramme"""
+    rank = q * (cumulative[-1] - 1)
+    index = int(np.searchsorted(cumulative, rank, side="right"))
+    before = cumulative[index - 1] if index else 0
+    fraction = (rank - before + 0.5) / counts[index]
+    return float(edges[index] + fraction * (edges[index + 1] - edges[index]))
+
+
+def filter_outliers(chunk: pd.DataFrame, bounds: dict) -> pd.DataFrame:
+    """Appliquer à un bloc des bornes IQR calculées au préalable (ex. `approximate_iqr_bounds`)"""
+    mask = np.ones(len(chunk), dtype=bool)
+    for col, (lower, upper) in bounds.items():
+        values = chunk[col].to_numpy()
+        mask &= (values >= lower) & (values <= upper)
+    return chunk[mask]
+
+
 def create_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Créer des variables dérivées"""
+    """Créer des variables dérivées (pipeline/features.py, partagé avec l'API)"""
     print("\n🧩 Création des features dérivées...")
-    if "year" in df.columns:
-        df["vehicle_age"] = CURRENT_YEAR - df["year"]
+    df = add_derived_features(df)
     print("✅ Features dérivées créées.")
     return df
 
 
-def build_pipeline(num_cols, cat_cols):
-    """Créer le pipeline de prétraitement et le modèle"""
+def build_pipeline(num_cols, cat_cols, **model_params):
+    """Créer le pipeline de prétraitement et le modèle (`model_params` surcharge MODEL_PARAMS)"""
     preprocessor = ColumnTransformer([
         ("num", StandardScaler(), num_cols),
         ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), cat_cols)
     ])
     base_pipeline = Pipeline([
         ("preprocessor", preprocessor),
-        ("model", RandomForestRegressor(n_estimators=100, max_depth=15, random_state=42, n_jobs=-1))
+        ("model", RandomForestRegressor(**{**MODEL_PARAMS, **model_params}))
     ])
     # Transformation log sur la variable cible
     return TransformedTargetRegressor(regressor=base_pipeline, func=np.log1p, inverse_func=np.expm1)
 
 
+def prepare_dataset(filepath: str) -> pd.DataFrame:
+    """Charger le CSV puis convertir les prix, retirer les outliers et créer les features"""
+    df = load_data(filepath)
+    df = convert_prices(df)
+    df = remove_outliers(df, OUTLIER_COLS)
+    return create_features(df)
+
+
+def dataset_cache_key(filepath: str) -> str:
+    """Clé du jeu préparé : contenu du CSV, version de la préparation et année de référence"""
+    return f"{file_sha256(filepath)[:16]}-v{DATASET_PREPARATION_VERSION}-{CURRENT_YEAR}"
+
+
+def load_prepared_dataset(filepath: str, cache_dir: str = DATASET_CACHE_DIR) -> pd.DataFrame:
+    """Jeu préparé, relu depuis le cache Parquet tant que le CSV n'a pas changé"""
+    cache_path = os.path.join(cache_dir, f"prepared-{dataset_cache_key(filepath)}.parquet")
+    if os.path.exists(cache_path):
+        df = pd.read_parquet(cache_path)
+        print(f"♻️ Jeu préparé relu depuis le cache : {cache_path} ({df.shape[0]} lignes)")
+        return df
+
+    df = prepare_dataset(filepath)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        df.to_parquet(f"{cache_path}.tmp", index=False)
+        os.replace(f"{cache_path}.tmp", cache_path)
+        print(f"💾 Jeu préparé mis en cache : {cache_path}")
+    except ImportError as e:
+        print(f"⚠️ Jeu préparé non mis en cache (pyarrow requis) : {e}")
+    return df
+
+
+def search_hyperparameters(X_train, y_train, num_cols, cat_cols, method: str = "random",
+                           n_iter: int = 20, cv: int = 5, workers: int = -1, space: dict = None):
+    """Rechercher les hyperparamètres de la forêt en validation croisée (grid, random ou halving)
+
+    Les couples candidat × fold sont répartis sur `workers` processus (joblib) ; chaque
+    forêt candidate est mono-thread pour ne pas surcharger les cœurs. Renvoie les
+    meilleurs paramètres et un rapport par candidat (R² moyen, écart-type, durée).
+    """
+    grid = {f"regressor__model__{name}": values for name, values in (space or SEARCH_SPACE).items()}
+    estimator = build_pipeline(num_cols, cat_cols, n_jobs=1)
+    options = {"scoring": "r2", "cv": cv, "n_jobs": workers, "refit": False}
+    if method == "grid":
+        search = GridSearchCV(estimator, grid, **options)
+    elif method == "random":
+        search = RandomizedSearchCV(estimator, grid, n_iter=n_iter, random_state=42, **options)
+    elif method == "halving":
+        search = HalvingRandomSearchCV(estimator, grid, n_candidates=n_iter, random_state=42, **options)
+    else:
+        raise ValueError(f"Méthode de recherche inconnue : {method}")
+
+    print(f"\n🔎 Recherche d'hyperparamètres ({method}, {cv} folds, workers={workers})...")
+    start = time.perf_counter()
+    search.fit(X_train, y_train)
+    wall_seconds = time.perf_counter() - start
+
+    results = search.cv_results_
+    candidates = []
+    for i, params in enumerate(results["params"]):
+        candidate = {
+            "params": {name.rsplit("__", 1)[-1]: value for name, value in params.items()},
+            "r2_mean": float(results["mean_test_score"][i]),
+            "r2_std": float(results["std_test_score"][i]),
+            # Durée du candidat : fit + score sur tous les folds (temps d'un worker)
+            "seconds": float((results["mean_fit_time"][i] + results["mean_score_time"][i]) * search.n_splits_),
+        }
+        if "n_resources" in results:
+            candidate["n_resources"] = int(results["n_resources"][i])
+        candidates.append(candidate)
+    candidates.sort(key=lambda c: (-c.get("n_resources", 0), -c["r2_mean"]))
+
+    print(f"✅ {len(candidates)} candidats évalués en {wall_seconds:.1f}s")
+    for candidate in candidates[:10]:
+        print(f"  R² {candidate['r2_mean']:.4f} ± {candidate['r2_std']:.4f}  "
+              f"{candidate['seconds']:6.1f}s  {candidate['params']}")
+
+    best_params = {name.rsplit("__", 1)[-1]: value for name, value in search.best_params_.items()}
+    print(f"🏆 Meilleurs paramètres : {best_params}")
+    report = {"method": method, "cv": cv, "workers": workers, "wall_seconds": wall_seconds,
+              "best_params": best_params, "candidates": candidates}
+    return best_params, report
+
+
+def regression_metrics(y, y_pred) -> dict:
+    """RMSE, MAE et R² des prédictions"""
+    return {
+        "RMSE": np.sqrt(mean_squared_error(y, y_pred)),
+        "MAE": mean_absolute_error(y, y_pred),
+        "R2": r2_score(y, y_pred)
+    }
+
+
 def evaluate_model(model, X_train, X_test, y_train, y_test):
     """Évaluer le modèle"""
     preds_train = model.predict(X_train)
     preds_test = model.predict(X_test)
 
-    def metrics(y, y_pred):
-        return {
-            "RMSE": np.sqrt(mean_squared_error(y, y_pred)),
-            "MAE": mean_absolute_error(y, y_pred),
-            "R2": r2_score(y, y_pred)
-        }
-
-    results = {"train": metrics(y_train, preds_train), "test": metrics(y_test, preds_test)}
+    results = {"train": regression_metrics(y_train, preds_train), "test": regression_metrics(y_test, preds_test)}
 
     print("\n📊 Performances du modèle :")
     print(f"  🟢 R² (train): {results['train']['R2']:.3f}")
@@ -104,6 +295,102 @@ def evaluate_model(model, X_train, X_test, y_train, y_test):
     return results, preds_train, preds_test
 
 
+def median_latency(model, X, repeat: int) -> float:
+    """Latence médiane (s) de `model.predict(X)` sur `repeat` appels"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def model_cost(model, num_cols, X_test) -> dict:
+    """Coût de service d'un modèle : latences unitaire et par lot (forêt mono-thread, comme l'API), tailles"""
+    forest = model.regressor_.named_steps["model"]
+    n_jobs = forest.n_jobs
+    forest.set_params(n_jobs=1)
+    try:
+        single_row = median_latency(model, X_test.iloc[:1], SWEEP_LATENCY_REPEAT)
+        batch = median_latency(model, X_test.iloc[:SWEEP_BATCH_ROWS], max(SWEEP_LATENCY_REPEAT // 10, 1))
+    finally:
+        forest.set_params(n_jobs=n_jobs)
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    compiled = compile_forest(model, num_cols)
+    return {
+        "single_row_ms": single_row * 1000,
+        "batch_ms": batch * 1000,
+        "batch_rows": min(SWEEP_BATCH_ROWS, len(X_test)),
+        "joblib_mb": buffer.tell() / 1e6,
+        "bundle_mb": sum(np.asarray(array).nbytes for array in compiled.values()) / 1e6,
+        "n_nodes": int(sum(estimator.tree_.node_count for estimator in forest.estimators_)),
+    }
+
+
+def pareto_front(candidates: list) -> list:
+    """Marquer les configurations non dominées (R² test plus haut ou latence unitaire plus basse)"""
+    for candidate in candidates:
+        candidate["pareto"] = not any(
+            other["r2_test"] >= candidate["r2_test"] and other["single_row_ms"] <= candidate["single_row_ms"]
+            and (other["r2_test"] > candidate["r2_test"] or other["single_row_ms"] < candidate["single_row_ms"])
+            for other in candidates
+        )
+    return candidates
+
+
+def sweep_model_sizes(X_train, X_test, y_train, y_test, num_cols, cat_cols, space: dict = None,
+                      r2_tolerance: float = None):
+    """Comparer précision et coût de service sur une grille de tailles de forêt
+
+    Chaque configuration de `space` (SWEEP_SPACE par défaut) est entraînée puis évaluée :
+    R² / RMSE / MAE sur le test, latences mesurées, tailles joblib et bundle. Avec
+    `r2_tolerance`, renvoie aussi le modèle le plus rapide (latence unitaire) dont le R²
+    test est à moins de `r2_tolerance` du meilleur.
+    """
+    space = space or SWEEP_SPACE
+    configs = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    print(f"\n📐 Balayage latence / précision : {len(configs)} configurations...")
+
+    candidates, models = [], []
+    for params in configs:
+        model = build_pipeline(num_cols, cat_cols, **params)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        test_metrics = regression_metrics(y_test, model.predict(X_test))
+        candidate = {
+            "params": params,
+            "r2_test": float(test_metrics["R2"]),
+            "rmse_test": float(test_metrics["RMSE"]),
+            "mae_test": float(test_metrics["MAE"]),
+            "fit_seconds": fit_seconds,
+            **model_cost(model, num_cols, X_test),
+        }
+        print(f"  R² {candidate['r2_test']:.4f}  {candidate['single_row_ms']:6.2f} ms/ligne  "
+              f"{candidate['batch_ms']:7.1f} ms/{candidate['batch_rows']}  {candidate['bundle_mb']:6.1f} Mo  {params}")
+        candidates.append(candidate)
+        models.append(model)
+
+    pareto_front(candidates)
+    print("\n🏁 Front de Pareto (R² test / latence unitaire) :")
+    for candidate in sorted((c for c in candidates if c["pareto"]), key=lambda c: c["single_row_ms"]):
+        print(f"  R² {candidate['r2_test']:.4f}  {candidate['single_row_ms']:6.2f} ms/ligne  {candidate['params']}")
+
+    report = {"space": space, "candidates": candidates}
+    selected = None
+    if r2_tolerance is not None:
+        best_r2 = max(c["r2_test"] for c in candidates)
+        eligible = [i for i, c in enumerate(candidates) if c["r2_test"] >= best_r2 - r2_tolerance]
+        index = min(eligible, key=lambda i: (candidates[i]["single_row_ms"], candidates[i]["bundle_mb"]))
+        selected = models[index]
+        report["selected"] = {"r2_tolerance": r2_tolerance, "best_r2": best_r2, **candidates[index]}
+        print(f"🏆 Modèle retenu (R² ≥ {best_r2 - r2_tolerance:.4f}) : {candidates[index]['params']} - "
+              f"R² {candidates[index]['r2_test']:.4f}, {candidates[index]['single_row_ms']:.2f} ms/ligne")
+    return report, selected
+
+
 def plot_overfitting_analysis(y_train, preds_train, y_test, preds_test, results):
     """Visualiser train vs test pour détecter l'overfitting"""
     print("\n📈 Génération du graphique d'analyse overfitting...")
@@ -162,24 +449,240 @@ def plot_feature_importance(model, num_cols, cat_cols):
     print(f"✅ Graphique sauvegardé : {OUTPUT_DIR}/feature_importance.png")
 
 
-def main():
-    """Pipeline complet d'entraînement"""
+def file_sha256(path: str) -> str:
+    """Empreinte SHA-256 d'un fichier (identifie le modèle pour lequel un artefact est généré)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compile_forest(model, num_cols) -> dict:
+    """Compiler la forêt en tableaux NumPy plats pour l'inférence côté API
+
+    - Le StandardScaler est replié dans les seuils : un nœud envoie à droite si x >= seuil brut.
+      sklearn compare float32((x - mean) / scale) <= t ; le seuil brut est donc placé au milieu
+      entre le plus grand float32 <= t et son successeur, puis ramené dans l'espace d'origine,
+      ce qui reproduit exactement les décisions de sklearn
+    - Les feuilles bouclent sur elles-mêmes (seuil +inf), ce qui permet un parcours vectorisé
+      de profondeur fixe pour tous les arbres à la fois
+    - Les valeurs des feuilles restent dans l'espace log1p : l'API moyenne les arbres puis applique expm1
+    """
+    if model.func is not np.log1p or model.inverse_func is not np.expm1:
+        raise ValueError("Seule la transformation log1p/expm1 de la cible est supportée")
+
+    regressor = model.regressor_
+    preprocessor = regressor.named_steps["preprocessor"]
+    forest = regressor.named_steps["model"]
+    if list(preprocessor.named_transformers_["num"].feature_names_in_) != list(num_cols):
+        raise ValueError("Les colonnes numériques ne correspondent pas au préprocesseur")
+    if forest.n_features_in_ != len(num_cols):
+        raise ValueError("La compilation ne supporte pas les variables catégorielles")
+
+    scaler = preprocessor.named_transformers_["num"]
+    mean, scale = scaler.mean_, scaler.scale_
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes)
+        is_leaf = tree.children_left == -1
+
+        # Frontière exacte de la décision float32 dans l'espace standardisé
+        low = tree.threshold.astype(np.float32)
+        low = np.where(low.astype(np.float64) > tree.threshold, np.nextafter(low, np.float32(-np.inf)), low)
+        high = np.nextafter(low, np.float32(np.inf))
+        boundary = (low.astype(np.float64) + high.astype(np.float64)) / 2
+
+        feature = np.where(is_leaf, 0, tree.feature)
+        threshold = np.where(is_leaf, np.inf, boundary * scale[feature] + mean[feature])
+        child = np.empty(2 * n_nodes, dtype=np.int64)
+        child[0::2] = np.where(is_leaf, node_ids, tree.children_left) + offset
+        child[1::2] = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+        features.append(feature)
+        thresholds.append(threshold)
+        children.append(child)
+        values.append(tree.value[:, 0, 0])
+        roots.append(offset)
+        offset += n_nodes
+
+    # Index en int64 : directement utilisables par NumPy sans conversion au chargement
+    return {
+        "feature_names": np.array(num_cols),
+        "feature": np.concatenate(features).astype(np.int64),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children": np.concatenate(children),
+        "value": np.concatenate(values).astype(np.float64),
+        "roots": np.array(roots, dtype=np.int64),
+        "max_depth": np.array(max(e.tree_.max_depth for e in forest.estimators_), dtype=np.int64),
+    }
+
+
+def replace_directory(tmp_dir: str, directory: str):
+    """Mettre `tmp_dir` (complet) à la place de `directory`
+
+    L'ancien répertoire est d'abord renommé à côté, puis le nouveau prend sa place : le
+    chemin ne manque qu'entre deux `rename` et pointe toujours vers un répertoire complet.
+    L'ancien n'est supprimé qu'ensuite (les processus qui l'ont mappé gardent leurs pages).
+    """
+    old_dir = f"{directory}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(directory):
+        os.rename(directory, old_dir)
+    os.rename(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def export_model_bundle(model, num_cols, cat_cols, directory: str, model_sha256: str = None):
+    """Sauvegarder la forêt compilée en bundle mmap : un .npy non compressé par tableau + meta.json
+
+    Les .npy (données alignées après l'en-tête) s'ouvrent avec `np.load(mmap_mode="r")` :
+    l'API est prête sans désérialiser le pickle, les pages sont lues à la demande et
+    partagées via le cache disque entre les processus.
+    """
+    compiled = compile_forest(model, num_cols)
+    feature_names = [str(name) for name in compiled.pop("feature_names")]
+    max_depth = int(compiled.pop("max_depth"))
+
+    # Écriture dans un répertoire temporaire puis renommage : pas de bundle à moitié écrit
+    tmp_dir = f"{directory}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array in compiled.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+    meta = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "feature_names": feature_names,
+        "max_depth": max_depth,
+        "n_trees": len(compiled["roots"]),
+        "arrays": sorted(compiled),
+        "feature_info": {"num_cols": list(num_cols), "cat_cols": list(cat_cols)},
+        "model_sha256": model_sha256,
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    replace_directory(tmp_dir, directory)
+
+    print(f"💾 Bundle du modèle sauvegardé dans : {directory} "
+          f"({meta['n_trees']} arbres, {len(compiled['value'])} nœuds)")
+    return meta
+
+
+def parse_lookup_grid(spec: str) -> dict:
+    """Lire une grille 'year=1990:2025:1,max_power_bhp=40:150:1,...' (min:max:pas par feature)"""
+    axes = {}
+    for item in spec.split(","):
+        name, bounds = item.split("=")
+        low, high, step = (int(v) for v in bounds.split(":"))
+        if step <= 0 or high < low:
+            raise ValueError(f"Axe invalide pour {name}: {bounds}")
+        axes[name.strip()] = (low, high, step)
+    if set(axes) != set(LOOKUP_FEATURES):
+        raise ValueError(f"La grille doit définir exactement : {', '.join(LOOKUP_FEATURES)}")
+    return {name: axes[name] for name in LOOKUP_FEATURES}
+
+
+def lookup_axis_sizes(axes: dict) -> list:
+    """Nombre de points de chaque axe de la grille"""
+    return [(high - low) // step + 1 for low, high, step in axes.values()]
+
+
+def lookup_inputs(axes: dict, flat_index: np.ndarray) -> pd.DataFrame:
+    """Décoder des index plats de la grille en features du modèle"""
+    coords = np.unravel_index(flat_index, lookup_axis_sizes(axes))
+    return feature_frame({
+        name: low + coord * step
+        for (name, (low, _, step)), coord in zip(axes.items(), coords)
+    })
+
+
+def observed_lookup_keys(X: pd.DataFrame):
+    """Axes et index plats des combinaisons entières distinctes observées dans les données"""
+    inputs = X[LOOKUP_FEATURES]
+    inputs = inputs[(inputs == inputs.round()).all(axis=1)].astype(np.int64)
+    axes = {name: (int(inputs[name].min()), int(inputs[name].max()), 1) for name in LOOKUP_FEATURES}
+    keys = np.ravel_multi_index(
+        [inputs[name].to_numpy() - low for name, (low, _, _) in axes.items()],
+        lookup_axis_sizes(axes)
+    )
+    return axes, np.unique(keys)
+
+
+def build_lookup_table(model, num_cols, axes: dict, output_dir: str, keys=None, model_sha256: str = None):
+    """Précalculer les prédictions sur une grille bornée (fichiers .npy mappables en mémoire)
+
+    - Mode "grid" (keys=None) : toutes les cellules de la grille, valeur = values[index]
+    - Mode "observed" : seulement les index `keys` (triés), retrouvés par recherche dichotomique
+    L'index d'une voiture se calcule par arithmétique sur les axes (min, max, pas).
+    `model_sha256` (empreinte de rf_model.joblib) est enregistrée dans meta.json : l'API
+    refuse une table générée pour un autre modèle.
+    """
+    sizes = lookup_axis_sizes(axes)
+    n_cells = int(np.prod(sizes))
+    if keys is None and n_cells > LOOKUP_MAX_CELLS:
+        raise ValueError(f"Grille trop grande : {n_cells:,} cellules (maximum {LOOKUP_MAX_CELLS:,})")
+
+    n_values = n_cells if keys is None else len(keys)
+    print(f"\n🧮 Précalcul de {n_values:,} prédictions ({'grid' if keys is None else 'observed'})...")
+
+    # Écriture dans un répertoire temporaire puis renommage : les fichiers mappés par
+    # l'API ne sont jamais réécrits sur place (SIGBUS si un fichier mappé est tronqué)
+    tmp_dir = f"{output_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    values = np.lib.format.open_memmap(f"{tmp_dir}/values.npy", mode="w+",
+                                       dtype=np.float64, shape=(n_values,))
+    for start in range(0, n_values, LOOKUP_CHUNK_SIZE):
+        stop = min(start + LOOKUP_CHUNK_SIZE, n_values)
+        flat_index = np.arange(start, stop) if keys is None else keys[start:stop]
+        values[start:stop] = model.predict(lookup_inputs(axes, flat_index)[num_cols])
+    values.flush()
+    del values
+
+    if keys is not None:
+        np.save(f"{tmp_dir}/keys.npy", np.asarray(keys, dtype=np.int64))
+
+    meta = {
+        "mode": "grid" if keys is None else "observed",
+        "features": list(axes),
+        "axes": {name: list(bounds) for name, bounds in axes.items()},
+        "sizes": sizes,
+        "n_values": n_values,
+        "model_sha256": model_sha256
+    }
+    with open(f"{tmp_dir}/meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
+    replace_directory(tmp_dir, output_dir)
+    print(f"💾 Table de prédictions sauvegardée dans : {output_dir}")
+    return meta
+
+
+def main(lookup_mode=None, lookup_grid=None, search=None, search_iter=20, search_cv=5,
+         search_workers=-1, use_cache=True, sweep=False, r2_tolerance=None):
+    """Pipeline complet d'entraînement
+
+    Avec `search`, recherche d'hyperparamètres ; avec `sweep`, balayage latence / précision
+    (et, si `r2_tolerance` est donné, sauvegarde du modèle le plus rapide dans la tolérance).
+    """
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(MODEL_DIR, exist_ok=True)
+
     print("\n" + "=" * 70)
     print("🚗 DÉMARRAGE DU PIPELINE - CarPriceML")
     print("=" * 70)
 
     # Chargement et préparation
-    df = load_data("../data/car-details.csv")
-    df = convert_prices(df)
-    df = remove_outliers(df,["selling_price", "year", "max_power_bhp", "torque_nm"])
-    df = create_features(df)
+    df = load_prepared_dataset(DATA_PATH) if use_cache else prepare_dataset(DATA_PATH)
 
     # Séparation features / target
-    cols = ['vehicle_age', 'year', 'max_power_bhp', 'torque_nm', 'engine_cc']
-    X = df[cols]
+    X = df[MODEL_FEATURES]
     y = df["selling_price"]
 
-    num_cols = X.select_dtypes(include=["int64", "float64"]).columns.tolist()
+    num_cols = X.select_dtypes(include="number").columns.tolist()
     cat_cols = X.select_dtypes(include=["object", "category"]).columns.tolist()
 
     X_train, X_test, y_train, y_test = train_test_split(
@@ -187,9 +690,26 @@ def main():
     )
     print(f"📊 Jeu d'entraînement : {X_train.shape}, Test : {X_test.shape}")
 
-    # Création et entraînement
-    model = build_pipeline(num_cols, cat_cols)
-    model.fit(X_train, y_train)
+    # Recherche d'hyperparamètres (optionnelle), puis entraînement
+    model_params = {}
+    if search:
+        model_params, report = search_hyperparameters(X_train, y_train, num_cols, cat_cols, search,
+                                                      n_iter=search_iter, cv=search_cv, workers=search_workers)
+        with open(f"{MODEL_DIR}/search_results.json", "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Rapport de recherche sauvegardé dans : {MODEL_DIR}/search_results.json")
+
+    model = None
+    if sweep:
+        sweep_report, model = sweep_model_sizes(X_train, X_test, y_train, y_test, num_cols, cat_cols,
+                                                r2_tolerance=r2_tolerance)
+        with open(f"{MODEL_DIR}/sweep_report.json", "w") as f:
+            json.dump(sweep_report, f, indent=2)
+        print(f"💾 Rapport latence / précision sauvegardé dans : {MODEL_DIR}/sweep_report.json")
+
+    if model is None:
+        model = build_pipeline(num_cols, cat_cols, **model_params)
+        model.fit(X_train, y_train)
 
     # Évaluation
     results, preds_train, preds_test = evaluate_model(model, X_train, X_test, y_train, y_test)
@@ -202,10 +722,73 @@ def main():
     joblib.dump(model, f"{MODEL_DIR}/rf_model.joblib")
     joblib.dump({"num_cols": num_cols, "cat_cols": cat_cols}, f"{MODEL_DIR}/feature_info.joblib")
     print(f"💾 Modèle sauvegardé dans : {MODEL_DIR}/rf_model.joblib")
+    model_sha256 = file_sha256(f"{MODEL_DIR}/rf_model.joblib")
+    export_model_bundle(model, num_cols, cat_cols, BUNDLE_DIR, model_sha256)
+
+    # Table de prédictions précalculées (optionnelle) ; sans --lookup-table, l'ancienne
+    # table (calculée par le modèle précédent) est supprimée
+    if lookup_mode == "observed":
+        axes, keys = observed_lookup_keys(X)
+        build_lookup_table(model, num_cols, axes, LOOKUP_DIR, keys=keys, model_sha256=model_sha256)
+    elif lookup_mode == "grid":
+        build_lookup_table(model, num_cols, parse_lookup_grid(lookup_grid), LOOKUP_DIR,
+                           model_sha256=model_sha256)
+    elif os.path.isdir(LOOKUP_DIR):
+        shutil.rmtree(LOOKUP_DIR)
+        print(f"🗑️ Table de prédictions obsolète supprimée : {LOOKUP_DIR}")
 
     print("\n✅ Pipeline terminé avec succès !")
     return model, results
 
 
+def export_only(lookup_grid=None):
+    """Compiler le modèle déjà sauvegardé (et précalculer la grille) sans réentraîner"""
+    model = joblib.load(f"{MODEL_DIR}/rf_model.joblib")
+    feature_info = joblib.load(f"{MODEL_DIR}/feature_info.joblib")
+    model_sha256 = file_sha256(f"{MODEL_DIR}/rf_model.joblib")
+    export_model_bundle(model, feature_info["num_cols"], feature_info["cat_cols"], BUNDLE_DIR, model_sha256)
+    if lookup_grid:
+        build_lookup_table(model, feature_info["num_cols"], parse_lookup_grid(lookup_grid), LOOKUP_DIR,
+                           model_sha256=model_sha256)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pipeline d'entraînement CarPriceML")
+    parser.add_argument("--export-only", action="store_true",
+                        help="Compiler le modèle existant (bundle rf_bundle/) sans réentraîner")
+    parser.add_argument("--lookup-table", choices=["observed", "grid"],
+                        help="Précalculer les prédictions (combinaisons observées ou grille --lookup-grid)")
+    parser.add_argument("--lookup-grid",
+                        help="Grille min:max:pas par feature, ex. "
+                             "'year=1990:2025:1,max_power_bhp=40:150:1,torque_nm=60:400:10,engine_cc=800:2500:100'")
+    parser.add_argument("--search", choices=["grid", "random", "halving"],
+                        help="Rechercher les hyperparamètres (SEARCH_SPACE) avant l'entraînement final")
+    parser.add_argument("--search-iter", type=int, default=20,
+                        help="Candidats tirés (random) ou de départ (halving)")
+    parser.add_argument("--search-cv", type=int, default=5, help="Nombre de folds de validation croisée")
+    parser.add_argument("--search-workers", type=int, default=-1, help="Processus de la recherche (-1 : tous les cœurs)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignorer le cache du jeu préparé")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Balayer SWEEP_SPACE : R² test, latences et tailles, front de Pareto")
+    parser.add_argument("--select-tolerance", type=float,
+                        help="Avec --sweep : sauvegarder le modèle le plus rapide dont le R² test est "
+                             "à moins de cette tolérance du meilleur (ex. 0.01)")
+    args = parser.parse_args()
+
+    if args.lookup_table == "grid" and not args.lookup_grid:
+        parser.error("--lookup-table grid nécessite --lookup-grid")
+    if args.export_only and args.lookup_table == "observed":
+        parser.error("--lookup-table observed nécessite les données d'entraînement (incompatible avec --export-only)")
+    if args.export_only and (args.search or args.sweep):
+        parser.error("--search et --sweep réentraînent le modèle (incompatibles avec --export-only)")
+    if args.search and args.sweep:
+        parser.error("--search et --sweep sont exclusifs")
+    if args.select_tolerance is not None and not args.sweep:
+        parser.error("--select-tolerance nécessite --sweep")
+
+    if args.export_only:
+        export_only(args.lookup_grid if args.lookup_table == "grid" else None)
+    else:
+        main(args.lookup_table, args.lookup_grid, search=args.search, search_iter=args.search_iter,
+             search_cv=args.search_cv, search_workers=args.search_workers, use_cache=not args.no_cache,
+             sweep=args.sweep, r2_tolerance=args.select_tolerance)
\ No newline at end of file
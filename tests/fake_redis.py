@@ -0,0 +1,78 @@
+"""
+Substitut Redis asynchrone en mémoire pour les tests et les benchmarks
+"""
+import asyncio
+
+
+class FakePipeline:
+    """Pipeline : les commandes sont mises en file puis exécutées en un aller-retour"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.commands = []
+
+    def setex(self, key, ttl, value):
+        self.commands.append(("setex", key, ttl, value))
+        return self
+
+    def get(self, key):
+        self.commands.append(("get", key))
+        return self
+
+    async def execute(self):
+        await self.redis.round_trip()
+        results = []
+        for command, key, *args in self.commands:
+            if command == "setex":
+                self.redis.store[key] = args[1]
+                results.append(True)
+            else:
+                results.append(self.redis.store.get(key))
+        self.commands = []
+        return results
+
+
+class FakeRedis:
+    """Sous-ensemble de `redis.asyncio.Redis` utilisé par l'API, avec compteur d'allers-retours
+
+    `latency` (secondes) simule le temps réseau de chaque aller-retour.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.store = {}
+        self.round_trips = 0
+        self.latency = latency
+
+    async def round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def ping(self):
+        await self.round_trip()
+        return True
+
+    async def get(self, key):
+        await self.round_trip()
+        return self.store.get(key)
+
+    async def mget(self, keys):
+        await self.round_trip()
+        return [self.store.get(key) for key in keys]
+
+    async def setex(self, key, ttl, value):
+        await self.round_trip()
+        self.store[key] = value
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def aclose(self):
+        pass
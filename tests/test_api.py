@@ -1,6 +1,7 @@
 """
 Tests unitaires pour l'API FastAPI
 """
+import contextlib
 import pytest
 from fastapi.testclient import TestClient
 import sys
@@ -9,7 +10,9 @@ import os
 # Ajouter le chemin de l'application au PYTHONPATH
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
 
-from app.main import app
+from app.main import app, LocalCache, CarFeatures, NumpyModelAdapter
+import app.main as main_module
+from tests.fake_redis import FakeRedis
 
 client = TestClient(app)
 
@@ -196,5 +199,502 @@ def test_cache_functionality():
             assert data1["predicted_price"] == data2["predicted_price"]
             # Le prediction_id sera différent mais le prix identique
 
+def test_predict_batch_order_and_consistency():
+    """Test de /predict/batch - ordre des résultats et cohérence avec /predict"""
+    cars = [
+        {"year": 2012, "max_power_bhp": 70, "torque_nm": 150, "engine_cc": 1200},
+        {"year": 2019, "max_power_bhp": 120, "torque_nm": 250, "engine_cc": 1800},
+        {"year": 2012, "max_power_bhp": 70, "torque_nm": 150, "engine_cc": 1200},
+    ]
+
+    response = client.post("/predict/batch", json=cars)
+
+    if response.status_code == 200:
+        data = response.json()
+        assert data["count"] == 3
+        assert len(data["predictions"]) == 3
+        for car, prediction in zip(cars, data["predictions"]):
+            assert prediction["input_features"] == car
+            assert isinstance(prediction["cached"], bool)
+            assert prediction["predicted_price"] > 0
+
+        # Même voiture => même prix, et identique à /predict
+        assert data["predictions"][0]["predicted_price"] == data["predictions"][2]["predicted_price"]
+        single = client.post("/predict", json=cars[1]).json()
+        assert single["predicted_price"] == data["predictions"][1]["predicted_price"]
+    else:
+        assert response.status_code == 503
+
+def test_predict_batch_empty():
+    """Test de /predict/batch avec un lot vide"""
+    response = client.post("/predict/batch", json=[])
+    assert response.status_code in [422, 503]
+
+def test_predict_batch_invalid_item():
+    """Test de /predict/batch avec une voiture invalide dans le lot"""
+    cars = [
+        {"year": 2014, "max_power_bhp": 74, "torque_nm": 190, "engine_cc": 1248},
+        {"year": 1800, "max_power_bhp": 74, "torque_nm": 190, "engine_cc": 1248},
+    ]
+    response = client.post("/predict/batch", json=cars)
+    assert response.status_code == 422  # Validation error
+
+def test_lifespan_startup_shutdown():
+    """Test du cycle de vie (pool Redis + executor d'inférence) avec des prédictions concurrentes"""
+    car_data = {"year": 2017, "max_power_bhp": 85, "torque_nm": 200, "engine_cc": 1400}
+
+    # Le contexte déclenche startup/shutdown, même sans Redis disponible
+    with TestClient(app) as lifespan_client:
+        health = lifespan_client.get("/health")
+        assert health.status_code in [200, 503]
+
+        response = lifespan_client.post("/predict", json=car_data)
+        assert response.status_code in [200, 503]
+
+    # L'executor est recréé à la demande après l'arrêt
+    response = client.post("/predict", json=car_data)
+    assert response.status_code in [200, 503]
+
+def test_local_cache_lru_and_ttl():
+    """Test du cache local (L1) - éviction LRU et expiration TTL"""
+    cache = LocalCache(max_size=2, ttl=60)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # "a" devient la plus récente
+    cache.set("c", {"v": 3})           # "b" est évincée
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("c") == {"v": 3}
+    assert len(cache) == 2
+
+    expired = LocalCache(max_size=2, ttl=0)
+    expired.set("a", {"v": 1})
+    assert expired.get("a") is None
+    assert len(expired) == 0
+
+def test_local_cache_hit_on_repeated_prediction():
+    """Test du cache local - la deuxième prédiction identique est servie depuis L1"""
+    car_data = {"year": 2011, "max_power_bhp": 66, "torque_nm": 140, "engine_cc": 1100}
+
+    response1 = client.post("/predict", json=car_data)
+    if response1.status_code == 200:
+        response2 = client.post("/predict", json=car_data)
+        assert response2.status_code == 200
+        assert response2.json()["cached"] is True
+        assert response2.json()["predicted_price"] == response1.json()["predicted_price"]
+
+def test_numpy_adapter_matches_dataframe_path():
+    """Test de l'adaptateur NumPy - mêmes prédictions que le pipeline alimenté par DataFrame"""
+    if main_module.serving_model.model is None:
+        pytest.skip("Modèle non chargé")
+
+    cars = [
+        CarFeatures(year=year, max_power_bhp=power, torque_nm=190, engine_cc=1248)
+        for year, power in [(2005, 60), (2014, 74), (2020, 150), (2025, 300)]
+    ]
+    serving = main_module.serving_model
+    adapter = NumpyModelAdapter(serving.model, serving.feature_info["num_cols"])
+    X = main_module.build_feature_matrix(cars, adapter.columns)
+
+    assert X.shape == (4, len(adapter.columns))
+    expected = serving.model.predict(main_module.build_features(cars))
+    assert (adapter.predict(X) == expected).all()
+
+def test_cache_key_canonical_and_versioned(monkeypatch):
+    """Test de la clé de cache - canonique, compacte et liée à la version du modèle"""
+    features = {"year": 2014, "max_power_bhp": 74, "torque_nm": 190, "engine_cc": 1248}
+    reordered = {"engine_cc": 1248, "torque_nm": 190, "max_power_bhp": 74, "year": 2014}
+
+    monkeypatch.setattr(main_module, "MODEL_VERSION", "v1.0")
+    key = main_module.generate_cache_key(features)
+    assert key == "prediction:v1.0:2014:74:190:1248"
+    assert main_module.generate_cache_key(reordered) == key
+    assert main_module.generate_cache_key({**features, "engine_cc": 1249}) != key
+
+    monkeypatch.setattr(main_module, "MODEL_VERSION", "v2.0")
+    assert main_module.generate_cache_key(features) != key
+
+def test_miss_writes_cache_in_one_round_trip_and_logs_in_background(monkeypatch):
+    """Test du chemin MISS - un pipeline pour le cache, log écrit par l'écrivain de fond"""
+    if main_module.serving_model.model is None:
+        pytest.skip("Modèle non chargé")
+
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(main_module, "local_cache", LocalCache(0, 0))
+    car_data = {"year": 2013, "max_power_bhp": 71, "torque_nm": 160, "engine_cc": 1197}
+
+    with TestClient(app) as lifespan_client:
+        monkeypatch.setattr(main_module, "redis_client", fake_redis)
+        response = lifespan_client.post("/predict", json=car_data)
+        assert response.status_code == 200
+        data = response.json()
+
+        # 1 GET (cache) + 1 pipeline (SETEX cache) sur le chemin de la requête
+        assert fake_redis.round_trips == 2
+        assert main_module.generate_cache_key(car_data) in fake_redis.store
+    # L'arrêt de l'application vide la file de logs
+    assert f"log:{data['prediction_id']}" in fake_redis.store
+
+def test_prediction_log_writer_batches_and_file_sink(tmp_path, monkeypatch):
+    """Test de l'écrivain de logs - écriture par lots (Redis + JSONL) et abandon si file pleine"""
+    import asyncio
+    import json as json_module
+
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(main_module, "redis_client", fake_redis)
+    log_file = tmp_path / "predictions.jsonl"
+
+    async def scenario():
+        writer = main_module.PredictionLogWriter(max_size=450, batch_size=200,
+                                                 flush_interval=60, file_path=str(log_file))
+        writer.start()
+        accepted = [writer.submit({"prediction_id": f"id{i}"}) for i in range(500)]
+        await writer.stop()
+        return accepted
+
+    accepted = asyncio.run(scenario())
+
+    assert sum(accepted) == 450  # 50 logs abandonnés (file pleine)
+    assert fake_redis.round_trips == 3  # 200 + 200 + 50
+    assert len([key for key in fake_redis.store if key.startswith("log:")]) == 450
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 450
+    assert json_module.loads(lines[0]) == {"prediction_id": "id0"}
+
+def test_prediction_ids_unique_and_sorted_across_threads():
+    """Test des IDs de prédiction - uniques et croissants sous concurrence"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    generator = main_module.PredictionIdGenerator()
+
+    def generate(n):
+        return [generator.next_id() for _ in range(n)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        batches = list(executor.map(generate, [20000] * 8))
+
+    all_ids = [prediction_id for batch in batches for prediction_id in batch]
+    assert len(set(all_ids)) == len(all_ids)
+    assert all(len(prediction_id) == 24 for prediction_id in all_ids)
+    for batch in batches:
+        assert batch == sorted(batch)  # triables par ordre de génération
+
+    # Deux workers distincts ne produisent jamais le même ID
+    node = generator.worker_id >> main_module.PredictionIdGenerator.PID_BITS
+    other = main_module.PredictionIdGenerator(node_id=node + 1)
+    assert not set(generate(1000)) & {other.next_id() for _ in range(1000)}
+
+def keep_serving_state(monkeypatch):
+    """Restaurer le modèle servi après un test de rechargement"""
+    for name in ("serving_model", "lookup_table", "MODEL_VERSION", "reload_lock"):
+        monkeypatch.setattr(main_module, name, getattr(main_module, name))
+    monkeypatch.setattr(main_module, "local_cache", LocalCache(0, 0))
+    monkeypatch.setattr(main_module, "redis_client", None)
+    monkeypatch.setattr(main_module, "ADMIN_TOKEN", "secret")
+
+ADMIN_HEADERS = {"X-Admin-Token": "secret"}
+
+def test_reload_model_swaps_version(monkeypatch):
+    """Test du rechargement à chaud - nouvelle version dans /health, les clés et les réponses"""
+    if main_module.serving_model.model is None:
+        pytest.skip("Modèle non chargé")
+    keep_serving_state(monkeypatch)
+    previous = main_module.serving_model
+    car_data = {"year": 2014, "max_power_bhp": 74, "torque_nm": 190, "engine_cc": 1248}
+
+    response = client.post("/admin/reload-model", json={"model_version": "v-reload"}, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json() == {"status": "reloaded", "previous_version": previous.version,
+                               "model_version": "v-reload"}
+    assert main_module.serving_model is not previous
+    assert client.get("/health").json()["model_version"] == "v-reload"
+    assert main_module.generate_cache_key(car_data).startswith("prediction:v-reload:")
+
+    data = client.post("/predict", json=car_data).json()
+    assert data["model_version"] == "v-reload"
+    assert data["predicted_price"] == round(float(previous.predict([CarFeatures(**car_data)])[0]), 2)
+
+    # Artefacts inchangés depuis le dernier rechargement : rien à faire
+    unchanged = client.post("/admin/reload-model", headers=ADMIN_HEADERS).json()
+    assert unchanged == {"status": "unchanged", "model_version": "v-reload"}
+
+    # Sans version explicite, elle est dérivée du contenu des artefacts
+    monkeypatch.setattr(main_module, "serving_model", previous)
+    derived = client.post("/admin/reload-model", headers=ADMIN_HEADERS).json()["model_version"]
+    assert derived == f"{main_module.MODEL_VERSION_BASE}-{main_module.artifact_fingerprint()[:8]}"
+
+def test_reload_model_rejects_invalid_candidate(monkeypatch):
+    """Test du rechargement à chaud - un modèle qui échoue au lot de contrôle n'est pas servi"""
+    import numpy as np
+
+    if main_module.serving_model.model is None:
+        pytest.skip("Modèle non chargé")
+    keep_serving_state(monkeypatch)
+    previous = main_module.serving_model
+    monkeypatch.setattr(main_module.ServingModel, "predict",
+                        lambda self, cars: np.full(len(cars), np.nan))
+
+    response = client.post("/admin/reload-model", json={"model_version": "v-broken"}, headers=ADMIN_HEADERS)
+    assert response.status_code == 500
+    assert main_module.serving_model is previous
+    assert main_module.MODEL_VERSION == previous.version
+
+def test_reload_model_requires_admin_token(monkeypatch):
+    """Test du rechargement à chaud - jeton exigé, endpoint fermé sans ADMIN_TOKEN"""
+    keep_serving_state(monkeypatch)
+    assert client.post("/admin/reload-model", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.post("/admin/reload-model").status_code == 403
+
+    monkeypatch.setattr(main_module, "ADMIN_TOKEN", None)
+    response = client.post("/admin/reload-model", headers={"X-Admin-Token": ""})
+    assert response.status_code == 403
+    assert "non configuré" in response.json()["detail"]
+
+def test_inflight_request_finishes_on_previous_model(monkeypatch):
+    """Test du rechargement à chaud - une requête en cours garde le modèle et la version du départ"""
+    import asyncio
+    import time
+    import httpx
+    import numpy as np
+
+    if main_module.serving_model.model is None:
+        pytest.skip("Modèle non chargé")
+    keep_serving_state(monkeypatch)
+
+    class SlowModel:
+        version = "v-old"
+        available = True
+        feature_info = None
+
+        def predict(self, cars):
+            time.sleep(0.3)
+            return np.full(len(cars), 1000.0)
+
+    monkeypatch.setattr(main_module, "serving_model", SlowModel())
+    car_data = {"year": 2014, "max_power_bhp": 74, "torque_nm": 190, "engine_cc": 1248}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            request = asyncio.create_task(async_client.post("/predict", json=car_data))
+            await asyncio.sleep(0.05)  # la requête est en cours d'inférence
+            reload_result = await main_module.reload_model("v-new")
+            return (await request).json(), reload_result
+
+    data, reload_result = asyncio.run(scenario())
+
+    assert reload_result["status"] == "reloaded"
+    assert data["model_version"] == "v-old"
+    assert data["predicted_price"] == 1000.0
+    assert main_module.serving_model.version == "v-new"
+
+def test_micro_batcher_coalesces_concurrent_misses(monkeypatch):
+    """Test du micro-batching - les miss concurrents partent en un seul appel au modèle"""
+    import asyncio
+    import httpx
+
+    serving = main_module.serving_model
+    if not serving.available:
+        pytest.skip("Modèle non chargé")
+    keep_serving_state(monkeypatch)
+    calls = []
+    predict = serving.predict
+    monkeypatch.setattr(serving, "predict", lambda cars: calls.append(len(cars)) or predict(cars))
+    monkeypatch.setattr(main_module, "micro_batcher", main_module.MicroBatcher(window=0.05, max_size=8))
+    cars = [{"year": 2000 + i, "max_power_bhp": 80, "torque_nm": 200, "engine_cc": 1500} for i in range(12)]
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            responses = await asyncio.gather(*[async_client.post("/predict", json=car) for car in cars])
+            return [response.json() for response in responses]
+
+    results = asyncio.run(scenario())
+
+    assert sorted(calls) == [4, 8]  # un lot plein (max_size) puis la fin de la fenêtre
+    expected = predict([CarFeatures(**car) for car in cars])
+    for car, data, price in zip(cars, results, expected):
+        assert data["input_features"] == car
+        assert data["predicted_price"] == round(float(price), 2)
+
+def test_batch_cache_uses_two_round_trips(monkeypatch):
+    """Test du lot - un MGET et un pipeline de SETEX, seuls les miss vont au modèle"""
+    if not main_module.serving_model.available:
+        pytest.skip("Modèle non chargé")
+
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(main_module, "redis_client", fake_redis)
+    monkeypatch.setattr(main_module, "local_cache", LocalCache(0, 0))
+    cars = [{"year": 2000 + i % 25, "max_power_bhp": 60 + i, "torque_nm": 150, "engine_cc": 1300}
+            for i in range(200)]
+
+    # Moitié des voitures déjà en cache
+    warm = client.post("/predict/batch", json=cars[::2])
+    assert warm.status_code == 200
+    assert fake_redis.round_trips == 2
+
+    fake_redis.round_trips = 0
+    calls = []
+    predict = main_module.serving_model.predict
+    monkeypatch.setattr(main_module.serving_model, "predict",
+                        lambda batch: calls.append(len(batch)) or predict(batch))
+    response = client.post("/predict/batch", json=cars)
+    assert response.status_code == 200
+    data = response.json()
+
+    assert fake_redis.round_trips == 2  # MGET + pipeline SETEX, quelle que soit la taille du lot
+    assert calls == [100]  # seuls les miss sont prédits
+    assert data["cached_count"] == 100
+    assert [p["cached"] for p in data["predictions"]] == [i % 2 == 0 for i in range(200)]
+    assert all(main_module.generate_cache_key(car) in fake_redis.store for car in cars)
+
+def test_predict_stream_csv_upload_in_chunks(monkeypatch):
+    """Test du scoring en flux - CSV en multipart, un appel au modèle par bloc, lignes invalides signalées"""
+    import json as json_module
+
+    serving = main_module.serving_model
+    if not serving.available:
+        pytest.skip("Modèle non chargé")
+    calls = []
+    predict = serving.predict
+    monkeypatch.setattr(serving, "predict", lambda cars: calls.append(len(cars)) or predict(cars))
+    monkeypatch.setattr(main_module, "STREAM_CHUNK_SIZE", 100)
+
+    rows = [(f"car-{i}", 2000 + i % 25, 60 + i % 90, 150 + i % 200, 1000 + i) for i in range(250)]
+    lines = ["stock_id,year,max_power_bhp,torque_nm,engine_cc"] + [",".join(map(str, row)) for row in rows]
+    lines.insert(51, "broken,abc,74,190,1248")  # 51e ligne de données
+    content = ("\n".join(lines) + "\n").encode()
+
+    response = client.post("/predict/stream", files={"file": ("inventaire.csv", content, "text/csv")})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = [json_module.loads(line) for line in response.text.splitlines()]
+
+    assert len(results) == 251
+    assert calls == [99, 100, 51]
+    assert results[50]["stock_id"] == "broken" and "year" in results[50]["error"]
+    valid = [result for result in results if "error" not in result]
+    assert [result["stock_id"] for result in valid] == [row[0] for row in rows]
+    expected = predict([CarFeatures(year=r[1], max_power_bhp=r[2], torque_nm=r[3], engine_cc=r[4]) for r in rows])
+    assert [result["predicted_price"] for result in valid] == [round(float(p), 2) for p in expected]
+
+def test_predict_stream_ndjson_to_csv():
+    """Test du scoring en flux - fichier NDJSON, résultats en CSV"""
+    import csv as csv_module
+    import io as io_module
+
+    if not main_module.serving_model.available:
+        pytest.skip("Modèle non chargé")
+    content = "\n".join([
+        '{"year": 2014, "max_power_bhp": 74, "torque_nm": 190, "engine_cc": 1248}',
+        'pas du json',
+        '{"year": 2019, "max_power_bhp": 120, "torque_nm": 250, "engine_cc": 1800}',
+    ]).encode()
+    response = client.post("/predict/stream?format=csv",
+                           files={"file": ("inventaire.ndjson", content, "application/x-ndjson")})
+    assert response.status_code == 200
+    assert response.headers["x-model-version"] == main_module.serving_model.version
+    rows = list(csv_module.DictReader(io_module.StringIO(response.text)))
+    assert [row["row"] for row in rows] == ["1", "2", "3"]
+    assert rows[0]["predicted_price"] and not rows[0]["error"]
+    assert rows[1]["error"].startswith("JSON invalide") and not rows[1]["predicted_price"]
+    assert rows[2]["predicted_price"]
+
+def test_predict_stream_csv_quoted_newlines_and_long_lines(monkeypatch):
+    """Test du scoring en flux - champ CSV multiligne entre guillemets, ligne NDJSON trop longue"""
+    import json as json_module
+
+    if not main_module.serving_model.available:
+        pytest.skip("Modèle non chargé")
+    content = b'note,year,max_power_bhp,torque_nm,engine_cc\n"ligne 1\nligne 2",2014,74,190,1248\nok,2019,120,250,1800\n'
+    response = client.post("/predict/stream", files={"file": ("stock.csv", content, "text/csv")})
+    results = [json_module.loads(line) for line in response.text.splitlines()]
+    assert [result["note"] for result in results] == ["ligne 1\nligne 2", "ok"]
+    assert all("predicted_price" in result for result in results)
+
+    monkeypatch.setattr(main_module, "STREAM_MAX_LINE_CHARS", 100)
+    content = ('{"note": "' + "x" * 500 + '"}\n'
+               '{"year": 2014, "max_power_bhp": 74, "torque_nm": 190, "engine_cc": 1248}\n').encode()
+    response = client.post("/predict/stream", files={"file": ("stock.ndjson", content, "application/x-ndjson")})
+    results = [json_module.loads(line) for line in response.text.splitlines()]
+    assert "100 caractères" in results[0]["error"]
+    assert results[1]["row"] == 2 and "predicted_price" in results[1]
+
+def test_predict_stream_rejects_unknown_format():
+    """Test du scoring en flux - corps brut ou format de fichier non reconnu"""
+    if not main_module.serving_model.available:
+        pytest.skip("Modèle non chargé")
+    response = client.post("/predict/stream", content=b"year\n2014\n", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 415
+    response = client.post("/predict/stream", files={"file": ("data.bin", b"\x00\x01", "application/octet-stream")})
+    assert response.status_code == 415
+
+def test_prediction_ids_unique_across_forked_workers():
+    """Test des IDs de prédiction - workers forkés avec le même WORKER_ID, aucune collision"""
+    import multiprocessing
+
+    generator = main_module.PredictionIdGenerator(node_id=7)
+    os.register_at_fork(after_in_child=generator.reset)
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+
+    def worker():
+        queue.put([generator.next_id() for _ in range(2000)])
+
+    processes = [ctx.Process(target=worker) for _ in range(2)]
+    for process in processes:
+        process.start()
+    batches = [queue.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join()
+
+    assert len(set(batches[0]) | set(batches[1])) == 4000
+
+def test_batch_treats_corrupt_cache_value_as_miss(monkeypatch):
+    """Test du lot - une valeur de cache illisible devient un miss, sans erreur 500"""
+    if not main_module.serving_model.available:
+        pytest.skip("Modèle non chargé")
+
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(main_module, "redis_client", fake_redis)
+    monkeypatch.setattr(main_module, "local_cache", LocalCache(0, 0))
+    cars = [{"year": 2011, "max_power_bhp": 70, "torque_nm": 150, "engine_cc": 1200},
+            {"year": 2012, "max_power_bhp": 70, "torque_nm": 150, "engine_cc": 1200}]
+    fake_redis.store[main_module.generate_cache_key(cars[0])] = "{pas du json"
+
+    response = client.post("/predict/batch", json=cars)
+    assert response.status_code == 200
+    assert [p["cached"] for p in response.json()["predictions"]] == [False, False]
+
+def stage_count(stage: str) -> float:
+    """Nombre d'observations de l'histogramme des étapes pour `stage`"""
+    from prometheus_client import REGISTRY
+    return REGISTRY.get_sample_value("prediction_stage_duration_seconds_count", {"stage": stage}) or 0.0
+
+def test_predict_stage_durations(monkeypatch):
+    """Chaque étape d'une prédiction calculée est mesurée, avec un span par étape si les traces sont activées"""
+    if not main_module.serving_model.available:
+        pytest.skip("Modèle non chargé")
+
+    spans = []
+
+    class FakeTracer:
+        def start_as_current_span(self, name):
+            spans.append(name)
+            return contextlib.nullcontext()
+
+    monkeypatch.setattr(main_module, "tracer", FakeTracer())
+    monkeypatch.setattr(main_module, "redis_client", FakeRedis())
+    monkeypatch.setattr(main_module, "local_cache", LocalCache(0, 0))
+    monkeypatch.setattr(main_module, "lookup_table", None)
+    stages = ["cache_key", "l1_cache", "redis_get", "inference", "features", "model", "response", "persist"]
+    before = {stage: stage_count(stage) for stage in stages}
+
+    response = client.post("/predict", json={"year": 2013, "max_power_bhp": 77, "torque_nm": 160, "engine_cc": 1300})
+    assert response.status_code == 200
+    for stage in stages:
+        assert stage_count(stage) == before[stage] + 1, stage
+    assert spans == stages
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
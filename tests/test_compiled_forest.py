@@ -0,0 +1,128 @@
+"""
+Tests de parité entre la forêt compilée (NumPy) et le modèle sklearn
+"""
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+import app.main as main_module
+from app.main import CarFeatures, CompiledForest
+from pipeline.train import compile_forest, export_model_bundle, replace_directory
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
+MODEL_PATH = os.path.join(MODELS_DIR, 'rf_model.joblib')
+FEATURE_INFO_PATH = os.path.join(MODELS_DIR, 'feature_info.joblib')
+
+pytestmark = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="Modèle non entraîné")
+
+
+@pytest.fixture(scope="module")
+def trained_model():
+    model = joblib.load(MODEL_PATH)
+    model.regressor_.named_steps["model"].set_params(n_jobs=1)
+    num_cols = joblib.load(FEATURE_INFO_PATH)["num_cols"]
+    return model, num_cols
+
+
+@pytest.fixture(scope="module")
+def compiled(trained_model):
+    model, num_cols = trained_model
+    return CompiledForest(compile_forest(model, num_cols))
+
+
+def random_cars(n, seed=0):
+    """Générer des voitures aléatoires couvrant tout le domaine de l'API"""
+    rng = np.random.default_rng(seed)
+    year = rng.integers(1990, 2026, n)
+    return pd.DataFrame({
+        'vehicle_age': (2025 - year).astype(float),
+        'year': year,
+        'max_power_bhp': rng.integers(0, 400, n).astype(float),
+        'torque_nm': rng.integers(0, 800, n).astype(float),
+        'engine_cc': rng.integers(0, 5000, n).astype(float)
+    })
+
+
+def test_compiled_forest_structure(trained_model, compiled):
+    """La forêt compilée contient tous les arbres et tous les nœuds"""
+    model, num_cols = trained_model
+    forest = model.regressor_.named_steps["model"]
+    assert compiled.feature_names == list(num_cols)
+    assert len(compiled.roots) == len(forest.estimators_)
+    assert len(compiled.value) == sum(e.tree_.node_count for e in forest.estimators_)
+    assert len(compiled.children) == 2 * len(compiled.value)
+
+
+def test_compiled_forest_parity_batch(trained_model, compiled):
+    """Prédictions identiques à sklearn sur un lot aléatoire"""
+    model, num_cols = trained_model
+    X = random_cars(5000)[num_cols]
+    expected = model.predict(X)
+    actual = compiled.predict(X.to_numpy(dtype=np.float64))
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_compiled_forest_parity_single_row(trained_model, compiled):
+    """Prédictions identiques à sklearn ligne par ligne"""
+    model, num_cols = trained_model
+    X = random_cars(50, seed=1)[num_cols]
+    for i in range(len(X)):
+        row = X.iloc[[i]]
+        assert compiled.predict(row.to_numpy(dtype=np.float64))[0] == model.predict(row)[0]
+
+
+@pytest.fixture(scope="module")
+def bundle_dir(trained_model, tmp_path_factory):
+    model, num_cols = trained_model
+    directory = str(tmp_path_factory.mktemp("bundle") / "rf_bundle")
+    export_model_bundle(model, num_cols, [], directory)
+    return directory
+
+
+def test_model_bundle_memory_mapped(trained_model, bundle_dir):
+    """Le bundle s'ouvre en mémoire mappée et prédit comme sklearn"""
+    model, num_cols = trained_model
+    loaded = CompiledForest.load(bundle_dir)
+    assert isinstance(loaded.value.base, np.memmap)
+    assert loaded.feature_info == {"num_cols": list(num_cols), "cat_cols": []}
+    X = random_cars(500, seed=2)[num_cols]
+    np.testing.assert_array_equal(loaded.predict(X.to_numpy(dtype=np.float64)), model.predict(X))
+
+
+def test_bundle_loads_sklearn_lazily(monkeypatch, bundle_dir):
+    """Avec un bundle, le pipeline sklearn n'est chargé qu'au premier grand lot"""
+    serving = main_module.ServingModel.load("v-test", MODEL_PATH, FEATURE_INFO_PATH, bundle_dir)
+    monkeypatch.setattr(main_module, "COMPILED_MAX_ROWS", 2)
+    cars = [CarFeatures(year=2010 + i, max_power_bhp=80, torque_nm=200, engine_cc=1500) for i in range(3)]
+
+    assert serving.compiled is not None and serving.model is None
+    small = serving.predict(cars[:2])
+    assert serving.model is None
+    large = serving.predict(cars)
+    assert serving.model is not None
+    np.testing.assert_array_equal(large[:2], small)
+
+
+def test_bundle_replaced_while_mapped(trained_model, tmp_path):
+    """Réexporter un bundle ne touche pas aux fichiers déjà mappés et ne laisse ni .tmp ni .old"""
+    model, num_cols = trained_model
+    directory = str(tmp_path / "rf_bundle")
+    export_model_bundle(model, num_cols, [], directory)
+    mapped = CompiledForest.load(directory)
+    expected = mapped.value.copy()
+
+    export_model_bundle(model, num_cols, [], directory)
+    np.testing.assert_array_equal(mapped.value, expected)
+    assert os.listdir(tmp_path) == ["rf_bundle"]
+
+
+def test_replace_directory_creates_missing_target(tmp_path):
+    """Première mise en place : pas d'ancien répertoire à écarter"""
+    (tmp_path / "new.tmp").mkdir()
+    (tmp_path / "new.tmp" / "meta.json").write_text("{}")
+    replace_directory(str(tmp_path / "new.tmp"), str(tmp_path / "new"))
+    assert os.listdir(tmp_path) == ["new"]
+    assert (tmp_path / "new" / "meta.json").read_text() == "{}"
@@ -0,0 +1,67 @@
+"""
+Tests du chargement par blocs (pipeline/data.py)
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.data import read_listings
+
+
+@pytest.fixture
+def listings(tmp_path):
+    """Annonces avec doublons (dans un bloc et entre blocs) et valeurs manquantes"""
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        'name': rng.choice(["Maruti Swift", "Hyundai i20", "Honda City", "Tata Nano"], n),
+        'year': rng.integers(2000, 2024, n),
+        'selling_price': rng.integers(50, 900, n) * 1000.0,
+        'km_driven': rng.integers(1000, 200000, n),
+        'fuel': rng.choice(["Diesel", "Petrol", "CNG"], n),
+        'max_power_bhp': rng.integers(40, 150, n) + 0.5,
+        'torque_nm': rng.integers(60, 400, n).astype(float),
+        'engine_cc': rng.integers(800, 2500, n).astype(float)
+    })
+    df = pd.concat([df, df.iloc[[3, 3, 250, 499]], df.iloc[:40]], ignore_index=True)
+    df.loc[[10, 300], 'max_power_bhp'] = np.nan
+    path = tmp_path / "car-details.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_chunked_loading_matches_pandas(listings):
+    """Par blocs : mêmes lignes que read_csv().drop_duplicates().dropna(), dans le même ordre"""
+    expected = pd.read_csv(listings).drop_duplicates().dropna().reset_index(drop=True)
+    df = read_listings(listings, chunk_size=64)
+
+    assert df.attrs["rows_read"] == 544
+    assert len(df) == len(expected)
+    pd.testing.assert_frame_equal(df.astype(expected.dtypes.to_dict()), expected)
+
+
+def test_explicit_dtypes(listings):
+    """Entiers et flottants réduits, chaînes en catégories (mêmes catégories dans tous les blocs)"""
+    df = read_listings(listings, chunk_size=64)
+    assert df["year"].dtype == np.int16
+    assert df["km_driven"].dtype == np.int32
+    assert df["max_power_bhp"].dtype == np.float32
+    assert df["selling_price"].dtype == np.float64
+    assert isinstance(df["name"].dtype, pd.CategoricalDtype)
+    assert set(df["fuel"].cat.categories) == {"Diesel", "Petrol", "CNG"}
+
+
+def test_raw_loading_keeps_duplicates_and_missing(listings):
+    """Sans nettoyage (analyse exploratoire), toutes les lignes sont conservées"""
+    df = read_listings(listings, chunk_size=64, drop_duplicates=False, dropna=False)
+    assert len(df) == 544
+    assert df["max_power_bhp"].isna().sum() == 2
+    assert df.duplicated().sum() == pd.read_csv(listings).duplicated().sum()
+
+
+def test_parquet_input(listings, tmp_path):
+    """Entrée Parquet lue par lots Arrow"""
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "car-details.parquet")
+    pd.read_csv(listings).to_parquet(path, index=False)
+    assert len(read_listings(path, chunk_size=64)) == len(read_listings(listings, chunk_size=64))
@@ -0,0 +1,79 @@
+"""
+Tests de l'analyse exploratoire incrémentale (pipeline/explore.py)
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import explore
+
+
+@pytest.fixture
+def listings(tmp_path):
+    """Annonces avec doublons, valeurs manquantes et prix extrêmes"""
+    rng = np.random.default_rng(0)
+    n = 300
+    df = pd.DataFrame({
+        'company': rng.choice(["Maruti", "Hyundai", "Honda", "Tata"], n),
+        'year': rng.integers(2000, 2024, n),
+        'selling_price': rng.lognormal(13, 0.6, n).round(-3),
+        'km_driven': rng.integers(1000, 200000, n),
+        'fuel': rng.choice(["Diesel", "Petrol", "CNG"], n),
+        'max_power_bhp': rng.integers(40, 150, n) + 0.5,
+    })
+    df = pd.concat([df, df.iloc[:5]], ignore_index=True)
+    df.loc[[7, 42], 'max_power_bhp'] = np.nan
+    path = tmp_path / "car-details.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    return {'output_dir': str(tmp_path / "visualizations"), 'cache_dir': str(tmp_path / "cache")}
+
+
+def test_statistics_match_pandas(listings):
+    """Une seule passe : mêmes résultats que les calculs séparés de l'ancienne analyse"""
+    df = explore.load_data(str(listings))
+    stats = explore.compute_statistics(df)
+    numeric = df.select_dtypes(include=np.number)
+
+    assert stats['duplicates'] == df.duplicated().sum() == 5
+    assert stats['missing'].to_dict() == {'max_power_bhp': 2}
+    pd.testing.assert_frame_equal(stats['describe'], df.describe())
+    pd.testing.assert_frame_equal(stats['corr'], numeric.corr())
+    for col in numeric:
+        Q1, Q3 = df[col].quantile([0.25, 0.75])
+        IQR = Q3 - Q1
+        expected = ((df[col] < Q1 - 1.5 * IQR) | (df[col] > Q3 + 1.5 * IQR)).sum()
+        assert stats['outliers'][col] == expected
+    assert stats['outliers']['selling_price'] > 0
+    assert len(stats['categories']['fuel']) == df['fuel'].nunique()
+
+
+def test_unchanged_dataset_is_not_reloaded(listings, dirs, monkeypatch):
+    """Second passage : statistiques relues du cache, aucun graphique redessiné"""
+    first = explore.run_analysis(str(listings), workers=1, **dirs)
+    assert first == list(explore.CHARTS)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("le fichier ne doit pas être rechargé")
+    monkeypatch.setattr(explore, "load_data", fail)
+    assert explore.run_analysis(str(listings), workers=1, **dirs) == []
+
+
+def test_only_changed_charts_are_rendered(listings, dirs, tmp_path):
+    """Seuls les graphiques dont les données changent sont redessinés (rendu parallèle)"""
+    explore.run_analysis(str(listings), workers=2, **dirs)
+    for name in explore.CHARTS:
+        assert (tmp_path / "visualizations" / f"{name}.png").exists()
+
+    df = pd.read_csv(listings)
+    df.loc[df['fuel'] == "CNG", 'fuel'] = "LPG"
+    df.to_csv(listings, index=False)
+    assert explore.run_analysis(str(listings), workers=2, **dirs) == ['05_fuel_type_distribution']
+
+    (tmp_path / "visualizations" / "03_price_vs_kms.png").unlink()
+    assert explore.run_analysis(str(listings), workers=1, **dirs) == ['03_price_vs_kms']
+    assert explore.run_analysis(str(listings), workers=1, use_cache=False, **dirs) == list(explore.CHARTS)
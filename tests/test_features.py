@@ -0,0 +1,41 @@
+"""
+Tests des features partagées (pipeline/features.py) : mêmes valeurs à l'entraînement et à l'API
+"""
+import numpy as np
+import pandas as pd
+
+from app.main import CarFeatures, build_feature_matrix, build_features
+from pipeline.features import CURRENT_YEAR, MODEL_FEATURES, feature_matrix, vehicle_age
+from pipeline.train import create_features, lookup_inputs
+
+
+def sample_cars():
+    return [CarFeatures(year=1990 + i, max_power_bhp=50 + i, torque_nm=100 + 2 * i, engine_cc=900 + 10 * i)
+            for i in range(CURRENT_YEAR - 1990 + 1)]
+
+
+def test_api_features_match_training():
+    """Les features de l'API sont celles que create_features calcule à l'entraînement"""
+    cars = sample_cars()
+    raw = pd.DataFrame([car.model_dump() for car in cars])
+    trained = create_features(raw)[MODEL_FEATURES].to_numpy(dtype=np.float64)
+
+    np.testing.assert_array_equal(build_feature_matrix(cars, MODEL_FEATURES), trained)
+    np.testing.assert_array_equal(build_features(cars).to_numpy(dtype=np.float64), trained)
+
+
+def test_feature_matrix_column_order():
+    """La matrice suit l'ordre de colonnes demandé par le modèle"""
+    inputs = {"year": np.array([2015, 2020]), "max_power_bhp": np.array([90, 120]),
+              "torque_nm": np.array([200, 300]), "engine_cc": np.array([1500, 2000])}
+    X = feature_matrix(inputs, ["engine_cc", "vehicle_age"])
+    np.testing.assert_array_equal(X, [[1500, vehicle_age(2015)], [2000, vehicle_age(2020)]])
+
+
+def test_lookup_inputs_use_shared_features():
+    """Les entrées de la table précalculée passent par les mêmes features"""
+    axes = {"year": (2010, 2012, 1), "max_power_bhp": (60, 60, 1), "torque_nm": (150, 150, 1),
+            "engine_cc": (1000, 1000, 1)}
+    inputs = lookup_inputs(axes, np.arange(3))
+    assert inputs.columns.tolist() == MODEL_FEATURES
+    assert inputs["vehicle_age"].tolist() == [CURRENT_YEAR - 2010, CURRENT_YEAR - 2011, CURRENT_YEAR - 2012]
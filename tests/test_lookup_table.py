@@ -0,0 +1,112 @@
+"""
+Tests de la table de prédictions précalculées (grille et combinaisons observées)
+"""
+import os
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main_module
+from app.main import CarFeatures, PredictionLookupTable
+from pipeline.train import build_lookup_table, file_sha256, observed_lookup_keys, parse_lookup_grid
+
+GRID = "year=2010:2020:2,max_power_bhp=60:100:20,torque_nm=150:250:50,engine_cc=1000:2000:500"
+
+pytestmark = pytest.mark.skipif(main_module.serving_model.model is None, reason="Modèle non chargé")
+
+
+def model_price(car: CarFeatures) -> float:
+    """Prix calculé par le modèle sklearn (référence)"""
+    return float(main_module.serving_model.model.predict(main_module.build_features([car]))[0])
+
+
+@pytest.fixture(scope="module")
+def grid_table(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("lookup_grid")
+    build_lookup_table(main_module.serving_model.model, main_module.serving_model.feature_info["num_cols"],
+                       parse_lookup_grid(GRID), str(directory))
+    return PredictionLookupTable(str(directory))
+
+
+def test_grid_table_hits_match_model(grid_table):
+    """Les points de la grille donnent exactement la prédiction du modèle"""
+    assert len(grid_table) == 6 * 3 * 3 * 3
+    for car in [
+        CarFeatures(year=2010, max_power_bhp=60, torque_nm=150, engine_cc=1000),
+        CarFeatures(year=2014, max_power_bhp=80, torque_nm=200, engine_cc=1500),
+        CarFeatures(year=2020, max_power_bhp=100, torque_nm=250, engine_cc=2000),
+    ]:
+        assert grid_table.get(car) == model_price(car)
+
+
+def test_grid_table_misses_off_grid(grid_table):
+    """Hors de la grille (pas ou bornes), la table ne répond pas"""
+    assert grid_table.get(CarFeatures(year=2011, max_power_bhp=60, torque_nm=150, engine_cc=1000)) is None
+    assert grid_table.get(CarFeatures(year=2022, max_power_bhp=60, torque_nm=150, engine_cc=1000)) is None
+    assert grid_table.get(CarFeatures(year=2010, max_power_bhp=120, torque_nm=150, engine_cc=1000)) is None
+
+
+def test_observed_table(tmp_path):
+    """Mode observed : seules les combinaisons entières vues dans les données sont servies"""
+    X = pd.DataFrame({
+        'year': [2012, 2015, 2015, 2018],
+        'max_power_bhp': [74.0, 88.5, 90.0, 120.0],
+        'torque_nm': [190.0, 200.0, 210.0, 300.0],
+        'engine_cc': [1248.0, 1500.0, 1600.0, 1998.0]
+    })
+    axes, keys = observed_lookup_keys(X)
+    assert len(keys) == 3  # 88.5 ch n'est pas une entrée possible de l'API
+    build_lookup_table(main_module.serving_model.model, main_module.serving_model.feature_info["num_cols"], axes, str(tmp_path), keys=keys)
+    table = PredictionLookupTable(str(tmp_path))
+
+    seen = CarFeatures(year=2015, max_power_bhp=90, torque_nm=210, engine_cc=1600)
+    assert table.get(seen) == model_price(seen)
+    assert table.get(CarFeatures(year=2015, max_power_bhp=90, torque_nm=210, engine_cc=1601)) is None
+    assert table.get(CarFeatures(year=2012, max_power_bhp=90, torque_nm=210, engine_cc=1600)) is None
+
+
+def test_predict_served_from_grid_table(grid_table, monkeypatch):
+    """/predict répond depuis la table, avec le même prix que le modèle"""
+    monkeypatch.setattr(main_module, "lookup_table", grid_table)
+    monkeypatch.setattr(main_module, "local_cache", main_module.LocalCache(0, 0))
+    car_data = {"year": 2016, "max_power_bhp": 100, "torque_nm": 150, "engine_cc": 1000}
+
+    response = TestClient(main_module.app).post("/predict", json=car_data)
+    assert response.status_code == 200
+    assert response.json()["predicted_price"] == round(model_price(CarFeatures(**car_data)), 2)
+
+
+def test_lookup_table_refused_for_another_model(tmp_path, monkeypatch):
+    """Seule une table générée pour le modèle servi (même empreinte) est ouverte"""
+    serving = main_module.serving_model
+    directory = str(tmp_path / "lookup")
+    monkeypatch.setattr(main_module, "LOOKUP_TABLE_PATH", directory)
+
+    build_lookup_table(serving.model, serving.feature_info["num_cols"], parse_lookup_grid(GRID), directory,
+                       model_sha256=file_sha256(serving.model_path))
+    assert main_module.open_lookup_table(serving) is not None
+    assert main_module.reopen_lookup_table(serving) is not None
+
+    build_lookup_table(serving.model, serving.feature_info["num_cols"], parse_lookup_grid(GRID), directory,
+                       model_sha256="0" * 64)
+    assert main_module.open_lookup_table(serving) is None
+    assert main_module.reopen_lookup_table(serving) is None
+
+    build_lookup_table(serving.model, serving.feature_info["num_cols"], parse_lookup_grid(GRID), directory)
+    assert main_module.open_lookup_table(serving) is None
+
+
+def test_lookup_table_rebuilt_without_leftovers(tmp_path):
+    """Une table régénérée remplace entièrement l'ancienne (pas de keys.npy ni de .tmp résiduels)"""
+    serving = main_module.serving_model
+    directory = str(tmp_path / "lookup")
+    X = pd.DataFrame({'year': [2012, 2015], 'max_power_bhp': [74.0, 90.0],
+                      'torque_nm': [190.0, 210.0], 'engine_cc': [1248.0, 1600.0]})
+    axes, keys = observed_lookup_keys(X)
+    build_lookup_table(serving.model, serving.feature_info["num_cols"], axes, directory, keys=keys)
+    build_lookup_table(serving.model, serving.feature_info["num_cols"], parse_lookup_grid(GRID), directory)
+
+    assert sorted(os.listdir(directory)) == ["meta.json", "values.npy"]
+    assert os.listdir(tmp_path) == ["lookup"]
+    assert PredictionLookupTable(directory).mode == "grid"
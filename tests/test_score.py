@@ -0,0 +1,72 @@
+"""
+Tests du scoring hors ligne (pipeline/score.py)
+"""
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.score import PREDICTION_COLUMN, score_file
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
+MODEL_PATH = os.path.join(MODELS_DIR, 'rf_model.joblib')
+FEATURE_INFO_PATH = os.path.join(MODELS_DIR, 'feature_info.joblib')
+
+pytestmark = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="Modèle non entraîné")
+
+
+@pytest.fixture(scope="module")
+def catalogue(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    n = 2500
+    df = pd.DataFrame({
+        'name': [f"car-{i}" for i in range(n)],
+        'year': rng.integers(1990, 2026, n),
+        'max_power_bhp': rng.integers(40, 150, n).astype(float),
+        'torque_nm': rng.integers(60, 400, n).astype(float),
+        'engine_cc': rng.integers(800, 2500, n).astype(float)
+    })
+    path = tmp_path_factory.mktemp("score") / "catalogue.csv"
+    df.to_csv(path, index=False)
+    return str(path), df
+
+
+def expected_prices(df: pd.DataFrame) -> np.ndarray:
+    model = joblib.load(MODEL_PATH)
+    num_cols = joblib.load(FEATURE_INFO_PATH)["num_cols"]
+    return model.predict(df.assign(vehicle_age=2025 - df["year"])[num_cols])
+
+
+def test_score_file_matches_model_in_order(catalogue, tmp_path):
+    """Les blocs prédits en parallèle sont réécrits dans l'ordre, avec les prix du modèle"""
+    input_path, df = catalogue
+    output_path = str(tmp_path / "scored.csv")
+    stats = score_file(input_path, output_path, MODEL_PATH, FEATURE_INFO_PATH, workers=2, chunk_size=300)
+
+    scored = pd.read_csv(output_path)
+    assert stats["rows"] == len(df) and stats["rows_per_second"] > 0
+    assert scored["name"].tolist() == df["name"].tolist()
+    np.testing.assert_allclose(scored[PREDICTION_COLUMN], expected_prices(df))
+
+
+def test_score_file_parquet(catalogue, tmp_path):
+    """Entrée et sortie Parquet"""
+    pytest.importorskip("pyarrow")
+    _, df = catalogue
+    input_path = str(tmp_path / "catalogue.parquet")
+    output_path = str(tmp_path / "scored.parquet")
+    df.to_parquet(input_path, index=False)
+
+    score_file(input_path, output_path, MODEL_PATH, FEATURE_INFO_PATH, workers=2, chunk_size=1000)
+    scored = pd.read_parquet(output_path)
+    np.testing.assert_allclose(scored[PREDICTION_COLUMN], expected_prices(df))
+
+
+def test_score_file_missing_column(tmp_path):
+    """Une colonne du modèle absente de l'entrée est signalée"""
+    input_path = str(tmp_path / "catalogue.csv")
+    pd.DataFrame({'year': [2015], 'max_power_bhp': [90.0]}).to_csv(input_path, index=False)
+    with pytest.raises(ValueError, match="torque_nm"):
+        score_file(input_path, str(tmp_path / "scored.csv"), MODEL_PATH, FEATURE_INFO_PATH, workers=1)
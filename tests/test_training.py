@@ -0,0 +1,166 @@
+"""
+Tests du pipeline d'entraînement : cache du jeu préparé et recherche d'hyperparamètres
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline.train as train
+from pipeline.features import MODEL_FEATURES
+
+
+def synthetic_listings(n: int, seed: int = 0) -> pd.DataFrame:
+    """Annonces synthétiques au format de car-details.csv (prix croissant avec la puissance)"""
+    rng = np.random.default_rng(seed)
+    year = rng.integers(2000, 2024, n)
+    power = rng.uniform(40, 150, n).round(1)
+    return pd.DataFrame({
+        'name': [f"car-{i}" for i in range(n)],
+        'year': year,
+        'selling_price': (power * 4000 + (year - 2000) * 15000 + rng.normal(0, 20000, n)).clip(50000),
+        'max_power_bhp': power,
+        'torque_nm': (power * 2 + rng.uniform(0, 40, n)).round(1),
+        'engine_cc': rng.integers(800, 2500, n).astype(float)
+    })
+
+
+@pytest.fixture
+def listings_csv(tmp_path):
+    path = tmp_path / "car-details.csv"
+    synthetic_listings(400).to_csv(path, index=False)
+    return str(path)
+
+
+def test_dataset_cache_key_follows_content(listings_csv, tmp_path):
+    """La clé du cache change avec le contenu du CSV, pas avec son chemin"""
+    copy = tmp_path / "copy.csv"
+    copy.write_bytes(open(listings_csv, "rb").read())
+    assert train.dataset_cache_key(listings_csv) == train.dataset_cache_key(str(copy))
+
+    synthetic_listings(400, seed=1).to_csv(copy, index=False)
+    assert train.dataset_cache_key(listings_csv) != train.dataset_cache_key(str(copy))
+
+
+def test_prepared_dataset_cached(listings_csv, tmp_path, monkeypatch):
+    """Le second chargement relit le Parquet sans refaire la préparation"""
+    pytest.importorskip("pyarrow")
+    cache_dir = str(tmp_path / "cache")
+    prepared = train.load_prepared_dataset(listings_csv, cache_dir)
+
+    monkeypatch.setattr(train, "prepare_dataset", lambda path: pytest.fail("cache non utilisé"))
+    cached = train.load_prepared_dataset(listings_csv, cache_dir)
+    pd.testing.assert_frame_equal(cached, prepared.reset_index(drop=True))
+
+
+@pytest.mark.parametrize("method", ["grid", "random", "halving"])
+def test_search_hyperparameters(method):
+    """Chaque méthode renvoie des paramètres de l'espace et un rapport par candidat"""
+    df = train.create_features(synthetic_listings(300))
+    space = {"n_estimators": [5, 10], "max_depth": [3, None]}
+    best_params, report = train.search_hyperparameters(
+        df[MODEL_FEATURES], df["selling_price"], MODEL_FEATURES, [], method,
+        n_iter=4, cv=3, workers=2, space=space
+    )
+
+    assert set(best_params) == set(space)
+    assert best_params["n_estimators"] in space["n_estimators"]
+    assert report["best_params"] == best_params and report["wall_seconds"] > 0
+    assert len(report["candidates"]) >= 4
+    for candidate in report["candidates"]:
+        assert candidate["seconds"] > 0 and candidate["r2_mean"] <= 1
+
+
+def test_pareto_front():
+    """Une configuration est sur le front si aucune autre n'est à la fois plus précise et plus rapide"""
+    candidates = train.pareto_front([
+        {"r2_test": 0.90, "single_row_ms": 5.0},
+        {"r2_test": 0.89, "single_row_ms": 2.0},
+        {"r2_test": 0.85, "single_row_ms": 3.0},  # dominée par la précédente
+        {"r2_test": 0.80, "single_row_ms": 1.0},
+    ])
+    assert [c["pareto"] for c in candidates] == [True, True, False, True]
+
+
+def test_sweep_selects_fastest_within_tolerance(monkeypatch):
+    """Le modèle retenu est le plus rapide parmi ceux proches du meilleur R²"""
+    monkeypatch.setattr(train, "SWEEP_LATENCY_REPEAT", 5)
+    df = train.create_features(synthetic_listings(400))
+    X_train, X_test = df[MODEL_FEATURES].iloc[:300], df[MODEL_FEATURES].iloc[300:]
+    y_train, y_test = df["selling_price"].iloc[:300], df["selling_price"].iloc[300:]
+    space = {"n_estimators": [5, 40], "max_depth": [2, None], "max_leaf_nodes": [None]}
+
+    report, model = train.sweep_model_sizes(X_train, X_test, y_train, y_test, MODEL_FEATURES, [],
+                                            space=space, r2_tolerance=1.0)
+    candidates = report["candidates"]
+    assert len(candidates) == 4 and any(c["pareto"] for c in candidates)
+    assert all(c["bundle_mb"] > 0 and c["n_nodes"] > 0 and c["single_row_ms"] > 0 for c in candidates)
+
+    selected = report["selected"]
+    assert selected["single_row_ms"] == min(c["single_row_ms"] for c in candidates)
+    assert model.regressor_.named_steps["model"].n_estimators == selected["params"]["n_estimators"]
+
+    _, model = train.sweep_model_sizes(X_train, X_test, y_train, y_test, MODEL_FEATURES, [], space=space)
+    assert model is None
+
+
+def legacy_remove_outliers(df, cols):
+    """Implémentation historique (colonne par colonne, DataFrame recopié à chaque étape)"""
+    for col in [c for c in cols if c in df.columns]:
+        Q1, Q3 = df[col].quantile([0.25, 0.75])
+        IQR = Q3 - Q1
+        df = df[(df[col] >= Q1 - 1.5 * IQR) & (df[col] <= Q3 + 1.5 * IQR)]
+    return df
+
+
+@pytest.fixture(scope="module")
+def heavy_tailed():
+    """Colonnes à queues lourdes, avec quelques valeurs manquantes"""
+    rng = np.random.default_rng(3)
+    n = 20_000
+    df = pd.DataFrame({
+        'selling_price': rng.lognormal(13, 0.8, n),
+        'year': rng.integers(1990, 2024, n).astype(np.int16),
+        'max_power_bhp': rng.standard_t(3, n).astype(np.float32) * 20 + 90,
+        'torque_nm': rng.standard_t(2, n) * 40 + 200,
+    })
+    df.loc[[5, 50, 500], 'torque_nm'] = np.nan
+    return df
+
+
+def test_remove_outliers_sequential_matches_legacy(heavy_tailed):
+    """`sequential=True` garde exactement les lignes de l'implémentation historique"""
+    cols = train.OUTLIER_COLS
+    expected = legacy_remove_outliers(heavy_tailed, cols)
+    pd.testing.assert_frame_equal(train.remove_outliers(heavy_tailed, cols, sequential=True), expected)
+
+
+def test_remove_outliers_single_pass(heavy_tailed):
+    """Par défaut, toutes les bornes viennent des données d'entrée et un seul masque est appliqué"""
+    cols = train.OUTLIER_COLS
+    kept = train.remove_outliers(heavy_tailed, cols)
+
+    mask = np.ones(len(heavy_tailed), dtype=bool)
+    for col in cols:
+        Q1, Q3 = heavy_tailed[col].quantile([0.25, 0.75])
+        IQR = Q3 - Q1
+        mask &= heavy_tailed[col].between(Q1 - 1.5 * IQR, Q3 + 1.5 * IQR).to_numpy()
+    pd.testing.assert_frame_equal(kept, heavy_tailed[mask])
+
+
+def test_approximate_iqr_bounds(heavy_tailed):
+    """Bornes approchées par blocs : à une classe d'histogramme près des bornes exactes"""
+    cols = train.OUTLIER_COLS
+    chunks = lambda: (heavy_tailed.iloc[i:i + 3000] for i in range(0, len(heavy_tailed), 3000))  # noqa: E731
+    bins = 1 << 14
+    bounds = train.approximate_iqr_bounds(chunks, cols, bins=bins)
+
+    for col in cols:
+        Q1, Q3 = heavy_tailed[col].quantile([0.25, 0.75])
+        IQR = Q3 - Q1
+        width = (heavy_tailed[col].max() - heavy_tailed[col].min()) / bins
+        assert bounds[col][0] == pytest.approx(Q1 - 1.5 * IQR, abs=4 * width)
+        assert bounds[col][1] == pytest.approx(Q3 + 1.5 * IQR, abs=4 * width)
+
+    kept = pd.concat(train.filter_outliers(chunk, bounds) for chunk in chunks())
+    exact = train.remove_outliers(heavy_tailed, cols)
+    assert abs(len(kept) - len(exact)) <= len(heavy_tailed) * 0.001